@@ -0,0 +1,384 @@
+import re
+import asyncio
+from time import time
+from math import log
+from random import random
+from pickle import dumps
+from hashlib import blake2b
+from functools import wraps, partial
+from inspect import iscoroutinefunction
+from threading import Lock, Event, Thread
+
+KEY_PROTOCOL = 4
+UNSAFE_KEY_CHARS = re.compile(r'[^A-Za-z0-9_.-]')
+FRESH, STALE, MISS = 'fresh', 'stale', 'miss'
+
+
+def cached(storage, ttl=None, key=None, lock_timeout=60, stale_ttl=0, beta=0):
+    """
+    Memoization Decorator
+    =====================
+    Cache the results of a function in any storage created by the StorageProvider.
+    Works with plain and async functions.
+
+    The first caller of a missing key computes the value while any other caller asking for
+    the same key waits for that result instead of computing it again (single-flight).
+    Callers are coalesced in-process and, for the Redis backends, across processes using
+    a Redis lock named "<key>.lock".
+
+    Example:
+        storage = StorageProvider().create(StorageProvider.STORAGE_PICKLE, path='/tmp/cache')
+
+        @cached(storage, ttl=60, stale_ttl=30, beta=1)
+        def expensive(a, b):
+            ...
+
+    Without a ttl the value is stored as it is, so the storage must be able to give it back
+    unchanged. RedisStorageService does not: it stores strings and returns bytes (a function
+    returning 4 returns b'4' once cached), use RedisJSONStorageService with Redis instead.
+    With a ttl the value is wrapped into a [value, expires_at, compute_seconds] list, which
+    RedisStorageService can not store either.
+
+    Stale-while-revalidate: after the ttl (soft expiration) the value is still served for
+    stale_ttl more seconds (hard expiration) while a single background refresh recomputes it.
+    Storages with their own expiration (Volatile, Redis) should keep values for at least
+    ttl + stale_ttl seconds.
+
+    Probabilistic early refresh (XFetch): with beta > 0 each access may trigger the background
+    refresh before the ttl is reached. The probability grows as the expiration gets closer and
+    with the time the function took to compute, so hot keys are refreshed before they expire.
+    beta=1 is a good default, bigger values refresh earlier.
+
+    :param storage: StorageService instance used to keep the results.
+    :param ttl: seconds to keep a result fresh. None means that it never expires.
+    :param key: callable receiving the same arguments as the function and returning the key.
+                By default the key is "<module>.<function>.<arguments hash>".
+    :param lock_timeout: seconds after which the Redis lock is released if its owner died.
+                         The lock is extended while the function is running.
+    :param stale_ttl: seconds a value can be served after its ttl while it is refreshed.
+    :param beta: XFetch factor for the probabilistic early refresh. 0 disables it.
+    """
+    if ttl is None and (stale_ttl or beta):
+        raise ValueError("stale_ttl and beta require a ttl")
+
+    def decorator(func):
+        prefix = UNSAFE_KEY_CHARS.sub('_', '{}.{}'.format(func.__module__, func.__qualname__))
+        flights = SingleFlight()
+        in_memory = getattr(storage, 'in_memory', False)
+
+        def cache_key(*args, **kwargs):
+            if key is not None:
+                return key(*args, **kwargs)
+            return '{}.{}'.format(prefix, hash_arguments(args, kwargs))
+
+        def lookup(name):
+            """
+            Return a (state, value, expires_at) tuple where state is FRESH, STALE or MISS.
+            """
+            try:
+                entry = storage[name]
+            except KeyError:
+                return MISS, None, None
+            if ttl is None:
+                return FRESH, entry, None
+            value, expires_at, delta = entry
+            now = time()
+            if now >= expires_at + stale_ttl:
+                return MISS, None, expires_at
+            if now >= expires_at:
+                return STALE, value, expires_at
+            if beta and now - delta * beta * log(1.0 - random()) >= expires_at:
+                return STALE, value, expires_at
+            return FRESH, value, expires_at
+
+        def store(name, value, delta):
+            storage[name] = value if ttl is None else [value, time() + ttl, delta]
+
+        def is_done(state, expires_at, observed):
+            """
+            Did somebody else store the value while we were waiting for the lock?
+            A refresh (observed is the expiration it saw) is done once the expiration moved.
+            """
+            return state is not MISS and (observed is None or expires_at != observed)
+
+        def load(name, call, observed=None):
+            with distributed_lock(storage, name, lock_timeout):
+                state, value, expires_at = lookup(name)
+                if is_done(state, expires_at, observed):
+                    return value
+                started = time()
+                value = call()
+                store(name, value, time() - started)
+                return value
+
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                name = cache_key(*args, **kwargs)
+                loop = asyncio.get_running_loop()
+
+                async def offload(function, *arguments):
+                    """
+                    Run a blocking storage call in the default executor, or inline for in-memory storages.
+                    """
+                    if in_memory:
+                        return function(*arguments)
+                    return await loop.run_in_executor(None, function, *arguments)
+
+                state, value, expires_at = await offload(lookup, name)
+                if state is FRESH:
+                    return value
+
+                async def compute(observed=None):
+                    lock = distributed_lock(storage, name, lock_timeout)
+                    await loop.run_in_executor(None, lock.__enter__)
+                    try:
+                        state, value, expires_at = await offload(lookup, name)
+                        if is_done(state, expires_at, observed):
+                            return value
+                        started = time()
+                        value = await func(*args, **kwargs)
+                        await offload(store, name, value, time() - started)
+                        return value
+                    finally:
+                        await loop.run_in_executor(None, lock.__exit__, None, None, None)
+
+                if state is STALE:
+                    flights.start_async(name, partial(compute, expires_at))
+                    return value
+                return await flights.run_async(name, compute)
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                name = cache_key(*args, **kwargs)
+                state, value, expires_at = lookup(name)
+                if state is FRESH:
+                    return value
+                call = partial(func, *args, **kwargs)
+                if state is STALE:
+                    flights.start(name, partial(load, name, call, expires_at))
+                    return value
+                return flights.run(name, partial(load, name, call))
+
+        def invalidate(*args, **kwargs):
+            """
+            Remove the cached result for the given arguments, if any.
+            """
+            try:
+                del storage[cache_key(*args, **kwargs)]
+            except KeyError:
+                pass
+
+        wrapper.cache_key = cache_key
+        wrapper.invalidate = invalidate
+        wrapper.storage = storage
+        return wrapper
+    return decorator
+
+
+def hash_arguments(args, kwargs):
+    """
+    Stable hash of the function arguments.
+    Dictionaries and sets are sorted by their representation before hashing, so the same
+    arguments give the same hash in every process regardless of insertion order or hash
+    randomization.
+
+    :param args: positional arguments tuple
+    :param kwargs: keyword arguments dictionary
+    :return hexadecimal string
+    """
+    payload = dumps((normalize(args), normalize(kwargs)), protocol=KEY_PROTOCOL)
+    return blake2b(payload, digest_size=16).hexdigest()
+
+
+def normalize(value):
+    """
+    Convert a value into an equivalent structure with a deterministic pickle representation.
+    """
+    if isinstance(value, dict):
+        return ('__dict__', tuple(sorted(((normalize(k), normalize(v)) for k, v in value.items()), key=repr)))
+    if isinstance(value, (set, frozenset)):
+        return ('__set__', tuple(sorted((normalize(v) for v in value), key=repr)))
+    if isinstance(value, (list, tuple)):
+        return type(value).__name__, tuple(normalize(v) for v in value)
+    return value
+
+
+def distributed_lock(storage, name, timeout):
+    """
+    Return a context manager that coordinates the computation of a key across processes.
+    Only the Redis backends (services exposing a redis_client) can be coordinated this way,
+    the rest of them get a no-op lock.
+    """
+    redis_client = getattr(storage, 'redis_client', None)
+    if redis_client is None:
+        return NullLock()
+    return RedisLock(redis_client.lock('{}.lock'.format(name), timeout=timeout, thread_local=False), timeout)
+
+
+class RedisLock(object):
+    """
+    Context manager around a Redis lock that keeps extending its timeout while it is held,
+    so a computation longer than the timeout does not lose the lock. If the lock was lost
+    anyway (for example the process was paused), releasing it does not fail: the value is
+    already computed and stored.
+    """
+    def __init__(self, lock, timeout):
+        self.lock = lock
+        self.timeout = timeout
+        self.released = Event()
+
+    def __enter__(self):
+        self.lock.acquire()
+        self.released.clear()
+        Thread(target=self.keep_alive, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        from redis.exceptions import LockError
+        self.released.set()
+        try:
+            self.lock.release()
+        except LockError:
+            pass
+        return False
+
+    def keep_alive(self):
+        from redis.exceptions import LockError
+        while not self.released.wait(self.timeout / 3.0):
+            try:
+                self.lock.extend(self.timeout, replace_ttl=True)
+            except LockError:
+                return
+
+
+class NullLock(object):
+    """
+    Context manager that does nothing. Used when there is nothing to coordinate.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class SingleFlight(object):
+    """
+    Single Flight
+    =============
+    Coalesce concurrent calls for the same key: the first caller runs the computation while
+    the rest of them wait and receive the same result (or exception).
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.flights = {}
+        self.async_flights = {}
+        self.tasks = set()
+
+    def run(self, key, compute):
+        """
+        Run compute() once for all the threads asking for the same key at the same time.
+
+        :param key: string key identifying the computation.
+        :param compute: callable without arguments.
+        :return the result of compute()
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+        if leader:
+            self.complete(key, flight, compute)
+        return flight.wait()
+
+    def start(self, key, compute):
+        """
+        Run compute() in a background thread unless a computation for the key is in progress.
+        Callers of run() for the same key wait for this computation.
+
+        :param key: string key identifying the computation.
+        :param compute: callable without arguments.
+        :return True if a new computation was started, False otherwise
+        """
+        with self.lock:
+            if key in self.flights:
+                return False
+            flight = self.flights[key] = Flight()
+        Thread(target=self.complete, args=(key, flight, compute), daemon=True).start()
+        return True
+
+    def complete(self, key, flight, compute):
+        try:
+            flight.result = compute()
+        except BaseException as ex:
+            flight.error = ex
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+    async def run_async(self, key, compute):
+        """
+        Await compute() once for all the tasks asking for the same key at the same time.
+        The computation runs in its own task, so cancelling one of the callers (like the first
+        one) does not cancel the computation nor the rest of the callers.
+
+        :param key: string key identifying the computation.
+        :param compute: coroutine function without arguments.
+        :return the result of compute()
+        """
+        loop = asyncio.get_running_loop()
+        self.start_async(key, compute)
+        return await asyncio.shield(self.async_flights[(loop, key)])
+
+    def start_async(self, key, compute):
+        """
+        Schedule compute() as a background task unless a computation for the key is in progress.
+        Callers of run_async() for the same key wait for this computation.
+
+        :param key: string key identifying the computation.
+        :param compute: coroutine function without arguments.
+        :return True if a new computation was started, False otherwise
+        """
+        loop = asyncio.get_running_loop()
+        if (loop, key) in self.async_flights:
+            return False
+        flight = self.async_flights[(loop, key)] = loop.create_future()
+        # Keep a reference to the task, otherwise it could be garbage collected while running.
+        task = loop.create_task(self.complete_async(loop, key, flight, compute))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return True
+
+    async def complete_async(self, loop, key, flight, compute):
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as ex:
+            flight.set_exception(ex)
+            # Retrieve it so asyncio does not complain about an exception that nobody waited for.
+            flight.exception()
+        else:
+            flight.set_result(result)
+        finally:
+            del self.async_flights[(loop, key)]
+
+
+class Flight(object):
+    """
+    A computation in progress shared by several threads.
+    """
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
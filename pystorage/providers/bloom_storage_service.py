@@ -0,0 +1,318 @@
+import atexit
+from os import open as open_descriptor, close, listdir, remove, replace, makedirs, getpid, O_RDWR, O_CREAT
+from os.path import isfile, isdir, dirname, join
+from uuid import uuid4
+from math import ceil, log
+from struct import Struct
+from hashlib import blake2b
+from threading import Lock
+from pystorage.providers.file_locking import fcntl, file_lock
+from pystorage.providers.storage_service import StorageService
+
+BLOOM_HEADER = Struct('<8sQI')
+BLOOM_MAGIC = b'PYSBLOM3'
+
+
+class BloomFilterStorageService(StorageService):
+    """
+    Bloom Filter Storage Service
+    ============================
+    Wrap any storage with a Bloom filter that answers the definite misses locally, without
+    asking the underlying storage. Useful for remote or disk storages (S3, Redis, DiskLRU) where
+    most of the lookups are misses and every membership check is a request or a file read.
+
+    The filter is updated on every insertion. Removals can not clear the bits, so deleted keys
+    are answered by the underlying storage until the filter is rebuilt from its keys.
+    When a path is given the filter is persisted there, so a restart does not need a full rebuild.
+    The filter is saved every `autosave` insertions, on close() and at exit, merging the bits
+    saved by other instances. Before its first unsaved insertion an instance creates a marker
+    file in "<path>.writers", locked (flock) until it saves. A filter with markers is rebuilt
+    instead of loaded, and the rebuild only removes the markers nobody holds, the ones left
+    by processes that crashed. Without fcntl (Windows) a rebuild removes all of them.
+
+    Example:
+        s3 = StorageProvider().create(StorageProvider.STORAGE_S3, bucket='my.bucket', folder='data/')
+        storage = BloomFilterStorageService(s3, capacity=1000000, path='/var/cache/data.bloom')
+        'missing' in storage      # Answered locally, no HEAD request
+        storage.close()           # Persist the filter (also done every `autosave` insertions and at exit)
+
+    Note: All the writes must go through this service. Keys written to the underlying storage
+    without it are not seen until rebuild() is called.
+    """
+    def __init__(self, storage, capacity=100000, error_rate=0.01, path=None, autosave=1000):
+        """
+        Initialize the filter. If a persisted filter with the same geometry exists in path it is
+        loaded, otherwise the filter is rebuilt iterating over the keys of the storage.
+
+        :param storage: StorageService to wrap
+        :param capacity: expected number of keys
+        :param error_rate: false positive probability when capacity keys are stored
+        :param path: file where the filter is persisted. None keeps it only in memory.
+        :param autosave: save the filter every autosave insertions. None or 0 disables it.
+        """
+        self.storage = storage
+        self.path = path
+        self.autosave = autosave
+        self.bits = int(ceil(-capacity * log(error_rate) / (log(2) ** 2)))
+        self.hashes = max(1, int(round(self.bits / capacity * log(2))))
+        self.lock = Lock()
+        self.pending = 0
+        self.marker = None
+        if path is not None:
+            makedirs(dirname(path) or '.', exist_ok=True)
+        if not self.load():
+            self.rebuild()
+        if path is not None:
+            atexit.register(self.close)
+
+    def __getitem__(self, key):
+        """
+        Lookup/Retrieve a value given its key and raise KeyError if not present.
+        Definite misses do not reach the underlying storage.
+
+        :param key: string|numeric value used as unique key.
+        :raise KeyError if the key was not found
+        """
+        if not self.might_contain(key):
+            raise KeyError(key)
+        return self.storage[key]
+
+    def __setitem__(self, key, value):
+        """
+        Insert a key/value pair into the storage and the filter.
+
+        :param key: string|integer key
+        :param value: object to store
+        :raise KeyError if there was a problem saving the key/value
+        """
+        self.mark_dirty()
+        self.storage[key] = value
+        self.add(key)
+
+    def __contains__(self, key):
+        """
+        Test for membership. Definite misses are answered by the filter in O(1),
+        possible hits are confirmed by the underlying storage.
+
+        :param key: string|integer key
+        :return True if the key exists, False otherwise
+        """
+        return self.might_contain(key) and key in self.storage
+
+    def __delitem__(self, key):
+        """
+        Remove an item from the storage. The filter keeps the key bits until the next rebuild.
+
+        :param key: string|integer key
+        """
+        del self.storage[key]
+
+    def __len__(self):
+        """
+        Returns the number of items stored in the underlying storage.
+
+        :return integer with the length of the collection
+        """
+        return len(self.storage)
+
+    def __iter__(self):
+        """
+        Iterate over the keys of the underlying storage.
+        """
+        return iter(self.storage)
+
+    def might_contain(self, key):
+        """
+        Test the filter only. False means that the key is definitely not stored.
+
+        :param key: string|integer key
+        :return False if the key is not stored, True if it could be.
+        """
+        bitmap = self.bitmap
+        for position in self.positions(key):
+            if not bitmap[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, key):
+        """
+        Set the bits of a key in the filter.
+
+        :param key: string|integer key
+        """
+        self.mark_dirty()
+        with self.lock:
+            for position in self.positions(key):
+                self.bitmap[position >> 3] |= 1 << (position & 7)
+            self.pending += 1
+            save = self.autosave and self.pending >= self.autosave
+        if save:
+            self.save()
+
+    def positions(self, key):
+        """
+        Bit positions of a key using double hashing over a 128 bits BLAKE2 digest.
+        Keys are hashed by their text, so 'key' and b'key' (as returned by Redis) are the same.
+        """
+        if not isinstance(key, bytes):
+            key = str(key).encode('utf-8')
+        digest = blake2b(key, digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def rebuild(self):
+        """
+        Build the filter from scratch iterating over all the keys of the underlying storage.
+        Use it to drop the bits of deleted keys or to see keys written by others.
+        The persisted filter is replaced, not merged. The markers of the writers that crashed
+        before the rebuild started are removed, the ones of running writers are kept.
+        """
+        if self.path is not None:
+            with file_lock(self.lock_path):
+                abandoned = self.abandoned_markers()
+        bitmap = bytearray((self.bits + 7) // 8)
+        for key in self.storage:
+            for position in self.positions(key):
+                bitmap[position >> 3] |= 1 << (position & 7)
+        with self.lock:
+            self.bitmap = bitmap
+            self.pending = 0
+            if self.path is None:
+                return
+            with file_lock(self.lock_path):
+                self.write()
+                for filename, descriptor in abandoned:
+                    remove(filename)
+                    close(descriptor)
+
+    def load(self):
+        """
+        Load the persisted filter.
+
+        :return True if the filter was loaded, False if it does not exist, its geometry differs
+                or some instance has a marker with insertions not saved.
+        """
+        if self.path is None:
+            return False
+        with file_lock(self.lock_path):
+            if self.markers():
+                return False
+            bitmap = self.read()
+        if bitmap is None:
+            return False
+        self.bitmap = bitmap
+        return True
+
+    def save(self):
+        """
+        Persist the filter in path, if any. The bits saved by other instances are merged (OR)
+        with the ones of this instance, and the file is replaced atomically.
+        """
+        with self.lock:
+            self.pending = 0
+            if self.path is None:
+                return
+            with file_lock(self.lock_path):
+                bitmap = self.read()
+                if bitmap is not None:
+                    self.bitmap = merge(self.bitmap, bitmap)
+                self.write()
+                if self.marker is not None:
+                    filename, descriptor = self.marker
+                    remove(filename)
+                    close(descriptor)
+                    self.marker = None
+
+    def close(self):
+        """
+        Save the insertions not persisted yet. Persisted filters are closed at exit too.
+        """
+        atexit.unregister(self.close)
+        if self.pending or self.marker is not None:
+            self.save()
+
+    def mark_dirty(self):
+        """
+        Create and lock the marker of this instance, once after every save.
+        """
+        if self.marker is not None or self.path is None:
+            return
+        with self.lock, file_lock(self.lock_path):
+            if self.marker is not None:
+                return
+            makedirs(self.writers_path, exist_ok=True)
+            filename = join(self.writers_path, uuid4().hex)
+            descriptor = open_descriptor(filename, O_RDWR | O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(descriptor, fcntl.LOCK_EX)
+            self.marker = (filename, descriptor)
+
+    def markers(self):
+        """
+        Writer marker files. Must be called holding the file lock.
+        """
+        if not isdir(self.writers_path):
+            return []
+        return [join(self.writers_path, name) for name in listdir(self.writers_path)]
+
+    def abandoned_markers(self):
+        """
+        Markers whose lock could be taken: their writers exited without saving. Their locks
+        are kept until they are removed. Must be called holding the file lock.
+
+        :return list of (filename, descriptor) tuples
+        """
+        abandoned = []
+        for filename in self.markers():
+            try:
+                descriptor = open_descriptor(filename, O_RDWR)
+            except FileNotFoundError:
+                continue
+            if fcntl is not None:
+                try:
+                    fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    # Held by a running writer
+                    close(descriptor)
+                    continue
+            abandoned.append((filename, descriptor))
+        return abandoned
+
+    @property
+    def lock_path(self):
+        return '{}.lock'.format(self.path)
+
+    @property
+    def writers_path(self):
+        return '{}.writers'.format(self.path)
+
+    def read(self):
+        """
+        Read the persisted filter.
+
+        :return bitmap, or None if there is no valid filter with this geometry
+        """
+        if not isfile(self.path):
+            return None
+        with open(self.path, 'rb') as fp:
+            header = fp.read(BLOOM_HEADER.size)
+            if len(header) != BLOOM_HEADER.size or BLOOM_HEADER.unpack(header) != (BLOOM_MAGIC, self.bits, self.hashes):
+                return None
+            bitmap = bytearray(fp.read())
+        if len(bitmap) != (self.bits + 7) // 8:
+            return None
+        return bitmap
+
+    def write(self):
+        temporary = '{}.{}.tmp'.format(self.path, getpid())
+        with open(temporary, 'wb') as fp:
+            fp.write(BLOOM_HEADER.pack(BLOOM_MAGIC, self.bits, self.hashes))
+            fp.write(self.bitmap)
+        replace(temporary, self.path)
+
+def merge(bitmap, other):
+    """
+    Bitwise OR of two bitmaps of the same length.
+    """
+    return bytearray((int.from_bytes(bitmap, 'little') | int.from_bytes(other, 'little')).to_bytes(len(bitmap), 'little'))
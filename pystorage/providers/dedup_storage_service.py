@@ -0,0 +1,147 @@
+from hashlib import blake2b
+from pickle import dumps
+from pystorage.providers.storage_service import StorageService
+
+DIGEST_PROTOCOL = 4
+# BLAKE2 personalization of every kind of content, so raw buffers and pickles never share a hash
+DIGEST_PERSON = {
+    bytes: b'pystorage.bytes',
+    bytearray: b'pystorage.barray',
+    memoryview: b'pystorage.mview'
+}
+DIGEST_PICKLE_PERSON = b'pystorage.pickle'
+
+
+class DedupStorageService(StorageService):
+    """
+    Deduplicating Storage Service
+    =============================
+    Content-addressed storage: every distinct value is saved once in a blobs storage under the
+    hash of its content, and the keys are lightweight references (the content hash) saved in
+    a references storage. Writing a value that already exists only writes the reference,
+    skipping the payload upload entirely.
+
+    Example:
+    - blobs = S3StorageService(bucket='my.bucket', folder='blobs/')
+    - references = S3StorageService(bucket='my.bucket', folder='references/')
+    storage = DedupStorageService(blobs, references)
+    storage['model.v1'] = artifact   # > blobs/<hash> and references/model.v1
+    storage['model.latest'] = artifact   # > references/model.latest (no upload)
+    storage.collect()   # Remove the blobs not referenced by any key
+
+    bytes values are hashed as they are, any other value is hashed by its pickle.
+    Removing or overwriting a key does not remove its blob, collect() does a mark-and-sweep
+    over all the references and removes the unreferenced blobs.
+
+    Note: A write running concurrently with collect() can reference a blob that the sweep is
+    removing. Run collect() when there are no writers, for example from a scheduled job.
+    """
+    def __init__(self, blobs, references):
+        """
+        :param blobs: StorageService holding the values by content hash
+        :param references: StorageService holding the content hash of every key
+        """
+        self.blobs = blobs
+        self.references = references
+
+    def __getitem__(self, key):
+        """
+        Lookup/Retrieve a value given its key and raise KeyError if not present.
+
+        :param key: string|numeric value used as unique key.
+        :raise KeyError if the key or its blob was not found
+        """
+        return self.blobs[self.digest_of(key)]
+
+    def __setitem__(self, key, value):
+        """
+        Insert a key/value pair into the storage. The value is only written if
+        there is no blob with the same content yet.
+
+        :param key: string|integer key
+        :param value: object to store
+        :raise KeyError if there was a problem saving the key/value
+        """
+        digest = content_hash(value)
+        if digest not in self.blobs:
+            self.blobs[digest] = value
+        self.references[key] = digest
+
+    def __contains__(self, key):
+        """
+        Test for membership.
+
+        :param key: string|integer key
+        :return True if the key exists, False otherwise
+        """
+        return key in self.references
+
+    def __delitem__(self, key):
+        """
+        Remove the key. The blob is kept until collect() finds it unreferenced.
+
+        :param key: string|integer key
+        """
+        del self.references[key]
+
+    def __len__(self):
+        """
+        Returns the number of keys stored (not the number of distinct values).
+
+        :return integer with the length of the collection
+        """
+        return len(self.references)
+
+    def __iter__(self):
+        """
+        Iterate over the stored keys.
+        """
+        return iter(self.references)
+
+    def digest_of(self, key):
+        """
+        Return the content hash referenced by a key.
+
+        :param key: string|integer key
+        :raise KeyError if the key was not found
+        """
+        digest = self.references[key]
+        # Binary storages (S3, Redis) give the reference back as bytes.
+        if isinstance(digest, bytes):
+            digest = digest.decode('ascii')
+        return digest
+
+    def collect(self):
+        """
+        Mark-and-sweep garbage collection: mark the blobs referenced by any key
+        and remove the rest of them.
+
+        :return number of removed blobs
+        """
+        live = set()
+        for key in list(self.references):
+            try:
+                live.add(self.digest_of(key))
+            except KeyError:
+                pass
+        garbage = []
+        for digest in list(self.blobs):
+            if isinstance(digest, bytes):
+                digest = digest.decode('ascii')
+            if digest not in live:
+                garbage.append(digest)
+        self.blobs.delete_many(garbage)
+        return len(garbage)
+
+
+def content_hash(value):
+    """
+    Hexadecimal BLAKE2 hash of a value content. bytes, bytearray and memoryview are hashed as
+    they are, any other value is hashed by its pickle. Every kind of content is hashed with its
+    own personalization, so b'x', bytearray(b'x') and a value pickled as b'x' do not collide.
+    """
+    person = DIGEST_PERSON.get(type(value))
+    if person is None:
+        value = dumps(value, protocol=DIGEST_PROTOCOL)
+        person = DIGEST_PICKLE_PERSON
+    return blake2b(value, digest_size=32, person=person).hexdigest()
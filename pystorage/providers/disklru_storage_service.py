@@ -1,7 +1,9 @@
-from os import remove, stat
+from os import stat, makedirs
 from os.path import join
 from glob import glob
 from pystorage.providers.storage_service import StorageService
+from pystorage.providers.pickle_storage_service import PickleStorageService
+from pystorage.providers.file_locking import file_lock, remove_file
 
 
 class DiskLRUStorageService(StorageService):
@@ -11,17 +13,17 @@ class DiskLRUStorageService(StorageService):
     This storage will store values in a internal pickle storage {storage}, until
     the lenght limit is reached. When the limit is reached, it purges the files removing the least
     accessed file considering the "time of most recent access" to determine the "least recently used" file.
+
+    With concurrent=True several threads and processes can share the folder: values are written
+    atomically (see PickleStorageService) and only one of them purges at a time. Purging removes
+    the file name, so readers that already opened it finish reading the value.
     """
-    def __init__(self, path='/tmp', suffix='storage.pkl', limit=100):
-        from pystorage.storage_provider import StorageProvider
-        self.storage = StorageProvider().create(
-            StorageProvider.STORAGE_PICKLE,
-            path=path,
-            suffix=suffix
-        )
+    def __init__(self, path='/tmp', suffix='storage.pkl', limit=100, concurrent=False):
+        self.storage = PickleStorageService(path=path, suffix=suffix, concurrent=concurrent)
         self.path = path
         self.suffix = suffix
         self.limit = limit
+        self.concurrent = concurrent
 
     def __getitem__(self, key):
         """
@@ -51,11 +53,7 @@ class DiskLRUStorageService(StorageService):
         :param key: string|integer key
         :return True if the key exists, False otherwise
         """
-        try:
-            self[key]
-        except KeyError:
-            return False
-        return True
+        return key in self.storage
 
     def __delitem__(self, key):
         """
@@ -76,9 +74,36 @@ class DiskLRUStorageService(StorageService):
     def purge(self):
         """
         Did the number reached the limit?
-        Purge the least recently used file
+        Purge the least recently used files to make space for a new one.
+        Files removed by someone else in the meantime are ignored.
+        """
+        if len(glob(join(self.path, '*.{}'.format(self.suffix)))) < self.limit:
+            return
+        if not self.concurrent:
+            self.remove_least_recently_used()
+            return
+        makedirs(self.path, exist_ok=True)
+        with file_lock(join(self.path, '.purge.lock')):
+            self.remove_least_recently_used()
+
+    def remove_least_recently_used(self):
+        accessed = []
+        for filename in glob(join(self.path, '*.{}'.format(self.suffix))):
+            try:
+                accessed.append((stat(filename).st_atime, filename))
+            except FileNotFoundError:
+                pass
+        accessed = sorted(accessed, key=lambda t: t[0])
+        for _, filename in accessed[:max(len(accessed) - self.limit + 1, 0)]:
+            try:
+                remove_file(filename, self.concurrent)
+            except FileNotFoundError:
+                pass
+
+    def __iter__(self):
+        """
+        Iterate over the stored keys.
+
+        :return iterator of string keys
         """
-        if len(glob(join(self.path, '*.{}'.format(self.suffix)))) >= self.limit:
-            file_sizes = [(stat(f).st_atime, f) for f in glob(join(self.path, '*.{}'.format(self.suffix)))]
-            file_sizes = sorted(file_sizes, key=lambda t: t[0])
-            remove(file_sizes[0][1])
+        return iter(self.storage)
@@ -0,0 +1,95 @@
+from os import open as open_descriptor, close, remove, replace, makedirs, getpid, O_RDWR, O_CREAT
+from os.path import join, dirname, basename
+from hashlib import blake2b
+from threading import get_ident
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:
+    # Advisory locks are not available on this platform (Windows), writes are still atomic.
+    fcntl = None
+
+# Files are guarded by a fixed pool of lock files, so there is no lock file per key
+LOCK_FOLDER = '.locks'
+LOCK_STRIPES = 64
+
+
+@contextmanager
+def file_lock(filename):
+    """
+    Exclusive advisory lock (flock) on a lock file, shared by all the threads and processes
+    of the host. The lock file is created if needed and never removed, so two processes
+    can not end up locking different files.
+
+    :param filename: lock file
+    """
+    if fcntl is None:
+        yield
+        return
+    descriptor = open_descriptor(filename, O_RDWR | O_CREAT, 0o644)
+    try:
+        fcntl.flock(descriptor, fcntl.LOCK_EX)
+        yield
+    finally:
+        # Closing the descriptor releases the lock.
+        close(descriptor)
+
+
+@contextmanager
+def write_file(filename, mode, concurrent=False, opener=open):
+    """
+    Open a file for writing. In concurrent mode the writers of the same file are serialized with
+    an advisory lock on its stripe_lock() file, and the content is written to a temporary file that is
+    atomically renamed over the old one when it is complete. Readers never see a partial file
+    and never block: they read either the old or the new version, and a reader that already
+    opened the old version keeps reading it even if it is replaced or removed.
+
+    :param filename: destination file
+    :param mode: open mode, 'w' or 'wb'
+    :param concurrent: use the lock and atomic rename
+    :param opener: function opening the file, like open or gzip.open
+    """
+    if not concurrent:
+        with opener(filename, mode) as fp:
+            yield fp
+        return
+    with file_lock(stripe_lock(filename)):
+        temporary = '{}.{}.{}.tmp'.format(filename, getpid(), get_ident())
+        try:
+            with opener(temporary, mode) as fp:
+                yield fp
+            replace(temporary, filename)
+        except BaseException:
+            try:
+                remove(temporary)
+            except OSError:
+                pass
+            raise
+
+
+def remove_file(filename, concurrent=False):
+    """
+    Remove a file. In concurrent mode the removal waits for the writers holding its lock.
+    Readers that already opened the file can keep reading it.
+
+    :param filename: file to remove
+    """
+    if not concurrent:
+        remove(filename)
+        return
+    with file_lock(stripe_lock(filename)):
+        remove(filename)
+
+
+def stripe_lock(filename):
+    """
+    Lock file guarding a file: one of the LOCK_STRIPES files of the ".locks" folder next to it,
+    chosen by the hash of the file name. Files sharing a stripe only delay each other's writers.
+
+    :param filename: guarded file
+    :return lock file path
+    """
+    folder = join(dirname(filename), LOCK_FOLDER)
+    makedirs(folder, exist_ok=True)
+    digest = blake2b(basename(filename).encode('utf-8'), digest_size=8).digest()
+    return join(folder, '{}.lock'.format(int.from_bytes(digest, 'little') % LOCK_STRIPES))
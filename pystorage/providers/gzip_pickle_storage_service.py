@@ -1,11 +1,12 @@
-from os import remove, makedirs
-from os.path import join, isfile, dirname
+from os import makedirs
+from os.path import join, isfile, dirname, basename
 from sys import exc_info
 from six import reraise
 from glob import glob
 import gzip
 from pickle import PickleError, dump, load, HIGHEST_PROTOCOL
 from pystorage.providers.storage_service import StorageService
+from pystorage.providers.file_locking import write_file, remove_file
 
 
 class GZipPickleStorageService(StorageService):
@@ -24,10 +25,14 @@ class GZipPickleStorageService(StorageService):
     storage['my'] = 'data'        # > /tmp/test/my.storage.pkl.gz (Create)
     data = storage['hello']       # < /tmp/test/hello.storage.pkl.gz (read)
 
+    With concurrent=True several threads and processes can share the folder: the writers of a key
+    are serialized with an advisory lock and files are replaced atomically, so readers never
+    block nor see a partial value.
     """
-    def __init__(self, path, suffix='storage.pkl.gz'):
+    def __init__(self, path, suffix='storage.pkl.gz', concurrent=False):
         self.path = path
         self.suffix = suffix
+        self.concurrent = concurrent
 
     def __getitem__(self, key):
         """
@@ -55,7 +60,7 @@ class GZipPickleStorageService(StorageService):
         filename = join(self.path, '{}.{}'.format(key, self.suffix))
         try:
             makedirs(dirname(filename), exist_ok=True)
-            with gzip.open(filename, 'wb') as pf:
+            with write_file(filename, 'wb', self.concurrent, opener=gzip.open) as pf:
                 dump(value, pf, protocol=HIGHEST_PROTOCOL)
         except (KeyError, IOError, PickleError):
             reraise(KeyError, KeyError("Error saving the content in {}".format(filename)), exc_info()[2])
@@ -77,7 +82,7 @@ class GZipPickleStorageService(StorageService):
         :param key: string|integer key
         """
         filename = join(self.path, '{}.{}'.format(key, self.suffix))
-        remove(filename)
+        remove_file(filename, self.concurrent)
 
     def __len__(self):
         """
@@ -86,3 +91,12 @@ class GZipPickleStorageService(StorageService):
         :return integer with the length of the collection
         """
         return len(glob(join(self.path, '*.{}'.format(self.suffix))))
+
+    def __iter__(self):
+        """
+        Iterate over the stored keys.
+
+        :return iterator of string keys
+        """
+        for filename in glob(join(self.path, '*.{}'.format(self.suffix))):
+            yield basename(filename)[:-len(self.suffix) - 1]
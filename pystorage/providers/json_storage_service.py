@@ -1,10 +1,11 @@
-from os import remove, makedirs
-from os.path import join, isfile, dirname
+from os import makedirs
+from os.path import join, isfile, dirname, basename
 import json
 from sys import exc_info
 from six import reraise
 from glob import glob
 from pystorage.providers.storage_service import StorageService
+from pystorage.providers.file_locking import write_file, remove_file
 
 
 class JSONStorageService(StorageService):
@@ -21,10 +22,14 @@ class JSONStorageService(StorageService):
     storage['my'] = 'data'        # > /tmp/test/my.storage.json (Create)
     data = storage['hello']       # < /tmp/test/hello.storage.json (read)
 
+    With concurrent=True several threads and processes can share the folder: the writers of a key
+    are serialized with an advisory lock and files are replaced atomically, so readers never
+    block nor see a partial value.
     """
-    def __init__(self, path='/tmp', suffix='storage.json'):
+    def __init__(self, path='/tmp', suffix='storage.json', concurrent=False):
         self.path = path
         self.suffix = suffix
+        self.concurrent = concurrent
 
     def __getitem__(self, key):
         """
@@ -52,7 +57,7 @@ class JSONStorageService(StorageService):
         filename = join(self.path, '{}.{}'.format(key, self.suffix))
         try:
             makedirs(dirname(filename), exist_ok=True)
-            with open(filename, 'w') as pf:
+            with write_file(filename, 'w', self.concurrent) as pf:
                 json.dump(value, pf)
         except (KeyError, IOError, UnicodeDecodeError):
             reraise(KeyError, KeyError("Error saving the content in {}".format(filename)), exc_info()[2])
@@ -74,7 +79,7 @@ class JSONStorageService(StorageService):
         :param key: string|integer key
         """
         filename = join(self.path, '{}.{}'.format(key, self.suffix))
-        remove(filename)
+        remove_file(filename, self.concurrent)
 
     def __len__(self):
         """
@@ -83,3 +88,12 @@ class JSONStorageService(StorageService):
         :return integer with the length of the collection
         """
         return len(glob(join(self.path, '*.{}'.format(self.suffix))))
+
+    def __iter__(self):
+        """
+        Iterate over the stored keys.
+
+        :return iterator of string keys
+        """
+        for filename in glob(join(self.path, '*.{}'.format(self.suffix))):
+            yield basename(filename)[:-len(self.suffix) - 1]
@@ -1,8 +1,10 @@
+from threading import RLock
 from pylru import lrucache
 from pystorage.providers.storage_service import StorageService
+from pystorage.providers.snapshot import SnapshotMixin
 
 
-class LRUStorageService(StorageService):
+class LRUStorageService(SnapshotMixin, StorageService):
     """
     Least recently used (LRU) Storage Service
     =========================================
@@ -14,7 +16,12 @@ class LRUStorageService(StorageService):
     A good approximation to the optimal algorithm is based on the observation that data that have been
     heavily used in the last few instructions will probably be heavily used again in the next few.
     When performing LRU caching, you always throw out the data that was least recently used.
+
+    The content can be saved with snapshot(path) and loaded with restore(path) keeping the LRU order.
+    Every access takes a lock, since lookups reorder the cache and snapshots may run in another thread.
     """
+    in_memory = True
+
     def __init__(self, memory_blocks=10):
         """
         Initialize the LRU storage with the maximum number of key/value pairs you want the storage to hold.
@@ -22,6 +29,7 @@ class LRUStorageService(StorageService):
         :param memory_blocks: Integer size of the storage.
         """
         self.storage = lrucache(memory_blocks)
+        self.lock = RLock()
 
     def __getitem__(self, key):
         """
@@ -31,7 +39,8 @@ class LRUStorageService(StorageService):
         :return object
         :raises KeyError if the key was not found
         """
-        return self.storage[key]
+        with self.lock:
+            return self.storage[key]
 
     def __setitem__(self, key, value):
         """
@@ -40,7 +49,8 @@ class LRUStorageService(StorageService):
         :param key: string|integer key
         :param value: object to store
         """
-        self.storage[key] = value
+        with self.lock:
+            self.storage[key] = value
 
     def __contains__(self, key):
         """
@@ -49,7 +59,8 @@ class LRUStorageService(StorageService):
         :param key: string|integer key
         :return True if the key exists, False otherwise
         """
-        return key in self.storage
+        with self.lock:
+            return key in self.storage
 
     def __delitem__(self, key):
         """
@@ -57,7 +68,8 @@ class LRUStorageService(StorageService):
 
         :param  key: string|integer key
         """
-        del self.storage[key]
+        with self.lock:
+            del self.storage[key]
 
     def __len__(self):
         """
@@ -66,4 +78,36 @@ class LRUStorageService(StorageService):
 
         :return integer with the length of the collection
         """
-        return len(self.storage)
+        with self.lock:
+            return len(self.storage)
+
+    def __iter__(self):
+        """
+        Iterate over the stored keys, from the most recently to the least recently used.
+        Does not affect the storage order.
+
+        :return iterator of keys
+        """
+        with self.lock:
+            return iter(list(self.storage.keys()))
+
+    def snapshot_items(self):
+        """
+        Snapshot records are (key, value) pairs from the least to the most recently used,
+        so restoring them in order rebuilds the same LRU order. The items are copied under the lock,
+        the values are pickled later without holding it.
+        """
+        with self.lock:
+            return reversed(list(self.storage.items()))
+
+    def restore_items(self, records):
+        """
+        Insert the snapshot records. If there are more records than memory blocks
+        the least recently used ones are evicted, as usual.
+        """
+        count = 0
+        for key, value in records:
+            with self.lock:
+                self.storage[key] = value
+            count += 1
+        return count
@@ -0,0 +1,189 @@
+import sys
+import pickle
+from os import remove, makedirs, replace, rename, getpid
+from os.path import join, isdir, exists, dirname, basename
+from shutil import rmtree
+from glob import glob
+from six import reraise
+from pystorage.errors import StorageProviderError
+from pystorage.providers.storage_service import StorageService
+
+FRAME_META = 'frame.pickle'
+
+
+class NumpyStorageService(StorageService):
+    """
+    NumPy Storage Service
+    =====================
+    This service stores NumPy arrays as .npy files and reads them back as memory mapped arrays,
+    so slicing a huge array only reads the pages that are needed and several processes reading
+    the same array share the page cache.
+
+    pandas DataFrames are stored as a folder with one .npy file per column, and read back as
+    a DataFrame built from the memory mapped columns. Other values are converted with numpy.asarray.
+    Object arrays (and columns) can not be memory mapped, they are pickled and fully loaded.
+
+    Example:
+    - path = /tmp/test/
+    storage['matrix'] = np.zeros((100000, 1000))   # > /tmp/test/matrix.storage.npy (Create)
+    storage['matrix'][10:20]                       # < reads only those rows
+    storage['frame'] = df                          # > /tmp/test/frame.storage.npy/ (Create)
+
+    Note: Values are replaced by renaming a new file over the old one, so readers holding a
+    memory map of the old value keep reading it. Frame folders can not be renamed over an
+    existing value, the old one is renamed aside first and removed once the new one is in place.
+    """
+    def __init__(self, path='/tmp/', suffix='storage.npy', mmap_mode='r'):
+        """
+        :param path: base folder
+        :param suffix: file suffix
+        :param mmap_mode: numpy.load memory map mode: 'r', 'r+', 'c' or None to load in memory
+        """
+        try:
+            import numpy  # NOQA
+            self.numpy = numpy
+        except ModuleNotFoundError:
+            raise StorageProviderError("NumPy not installed. Please execute pip install numpy")
+        self.path = path
+        self.suffix = suffix
+        self.mmap_mode = mmap_mode
+
+    def __getitem__(self, key):
+        """
+        Lookup/Retrieve a value given its key and raise KeyError if not present.
+
+        :param key: string|numeric value used as unique key.
+        :return numpy.memmap (or pandas.DataFrame for stored frames)
+        :raise KeyError if the key/file was not found
+        """
+        filename = self.filename(key)
+        try:
+            if isdir(filename):
+                return self.load_frame(filename)
+            return self.load(filename)
+        except (KeyError, IOError, ValueError, EOFError, ImportError, IndexError, pickle.PickleError):
+            reraise(KeyError, KeyError("Error opening the content from {}".format(filename)), sys.exc_info()[2])
+
+    def __setitem__(self, key, value):
+        """
+        Insert a key/value pair into the storage.
+
+        :param key: string|integer key
+        :param value: numpy array, pandas DataFrame or array-like object to store
+        :raise KeyError if there was a problem saving the key/value
+        """
+        filename = self.filename(key)
+        temporary = '{}.{}.tmp'.format(filename, getpid())
+        try:
+            makedirs(dirname(filename), exist_ok=True)
+            pandas = sys.modules.get('pandas')
+            if pandas is not None and isinstance(value, pandas.DataFrame):
+                self.save_frame(temporary, value)
+            else:
+                with open(temporary, 'wb') as fp:
+                    self.numpy.save(fp, self.numpy.asarray(value))
+            self.swap(temporary, filename)
+        except (KeyError, IOError, ValueError, TypeError):
+            if exists(temporary):
+                self.remove(temporary)
+            reraise(KeyError, KeyError("Error saving the content in {}".format(filename)), sys.exc_info()[2])
+
+    def __contains__(self, key):
+        """
+        Test for membership. Does not affect the storage order.
+
+        :param key: string|integer key
+        :return True if the key exists, False otherwise
+        """
+        return exists(self.filename(key))
+
+    def __delitem__(self, key):
+        """
+        Remove an item from the storage.
+
+        :param key: string|integer key
+        """
+        self.remove(self.filename(key))
+
+    def __len__(self):
+        """
+        Returns the number of items stored.
+
+        :return integer with the length of the collection
+        """
+        return len(glob(join(self.path, '*.{}'.format(self.suffix))))
+
+    def __iter__(self):
+        """
+        Iterate over the stored keys.
+
+        :return iterator of string keys
+        """
+        for filename in glob(join(self.path, '*.{}'.format(self.suffix))):
+            yield basename(filename)[:-len(self.suffix) - 1]
+
+    def filename(self, key):
+        return join(self.path, '{}.{}'.format(key, self.suffix))
+
+    def load(self, filename):
+        """
+        Load an array memory mapped. Object arrays can not be mapped, so they are unpickled.
+        """
+        try:
+            return self.numpy.load(filename, mmap_mode=self.mmap_mode)
+        except ValueError:
+            return self.numpy.load(filename, allow_pickle=True)
+
+    def save_frame(self, folder, frame):
+        """
+        Save a DataFrame as one .npy file per column (by position, so duplicated names are kept)
+        plus the index, and the pickled column labels and index name, so tuples and MultiIndex
+        labels come back as they were.
+        """
+        makedirs(folder)
+        for position in range(frame.shape[1]):
+            self.numpy.save(join(folder, '{}.npy'.format(position)), frame.iloc[:, position].to_numpy())
+        self.numpy.save(join(folder, 'index.npy'), frame.index.to_numpy())
+        with open(join(folder, FRAME_META), 'wb') as fp:
+            pickle.dump({'columns': frame.columns, 'index': frame.index.name}, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load_frame(self, folder):
+        """
+        Load a DataFrame saved by save_frame() from its memory mapped columns.
+        """
+        import pandas
+        with open(join(folder, FRAME_META), 'rb') as fp:
+            meta = pickle.load(fp)
+        columns = [self.load(join(folder, '{}.npy'.format(position))) for position in range(len(meta['columns']))]
+        index = pandas.Index(self.load(join(folder, 'index.npy')), name=meta['index'])
+        # Built by position and labelled afterwards, labels may be duplicated or not hashable in a dict
+        frame = pandas.DataFrame(dict(enumerate(columns)), index=index, copy=False)
+        frame.columns = meta['columns']
+        return frame
+
+    def swap(self, temporary, filename):
+        """
+        Move a new value written in temporary to filename. Files replace files atomically. When a
+        folder is involved the old value is renamed aside, the new one renamed in, and the old one
+        removed: the key never holds a partial value, and the old one is restored on errors.
+        """
+        if not isdir(temporary) and not isdir(filename):
+            replace(temporary, filename)
+            return
+        if not exists(filename):
+            rename(temporary, filename)
+            return
+        previous = '{}.{}.old'.format(filename, getpid())
+        rename(filename, previous)
+        try:
+            rename(temporary, filename)
+        except OSError:
+            rename(previous, filename)
+            raise
+        self.remove(previous)
+
+    def remove(self, filename):
+        if isdir(filename):
+            rmtree(filename)
+        else:
+            remove(filename)
@@ -1,10 +1,11 @@
-from os import remove, makedirs
-from os.path import join, isfile, dirname
+from os import makedirs
+from os.path import join, isfile, dirname, basename
 from sys import exc_info
 from six import reraise
 from glob import glob
 from pickle import PickleError, dump, load, HIGHEST_PROTOCOL
 from pystorage.providers.storage_service import StorageService
+from pystorage.providers.file_locking import write_file, remove_file
 
 
 class PickleStorageService(StorageService):
@@ -22,10 +23,14 @@ class PickleStorageService(StorageService):
     storage['my'] = 'data'        # > /tmp/test/my.storage.pkl (Create)
     data = storage['hello']       # < /tmp/test/hello.storage.pkl (read)
 
+    With concurrent=True several threads and processes can share the folder: the writers of a key
+    are serialized with an advisory lock and files are replaced atomically, so readers never
+    block nor see a partial value.
     """
-    def __init__(self, path='/tmp/', suffix='storage.pkl'):
+    def __init__(self, path='/tmp/', suffix='storage.pkl', concurrent=False):
         self.path = path
         self.suffix = suffix
+        self.concurrent = concurrent
 
     def __getitem__(self, key):
         """
@@ -53,7 +58,7 @@ class PickleStorageService(StorageService):
         filename = join(self.path, '{}.{}'.format(key, self.suffix))
         try:
             makedirs(dirname(filename), exist_ok=True)
-            with open(filename, 'wb') as pf:
+            with write_file(filename, 'wb', self.concurrent) as pf:
                 dump(value, pf, protocol=HIGHEST_PROTOCOL)
         except (KeyError, IOError, PickleError):
             reraise(KeyError, KeyError("Error saving the content in {}".format(filename)), exc_info()[2])
@@ -75,7 +80,7 @@ class PickleStorageService(StorageService):
         :param key: string|integer key
         """
         filename = join(self.path, '{}.{}'.format(key, self.suffix))
-        remove(filename)
+        remove_file(filename, self.concurrent)
 
     def __len__(self):
         """
@@ -84,3 +89,12 @@ class PickleStorageService(StorageService):
         :return integer with the length of the collection
         """
         return len(glob(join(self.path, '*.{}'.format(self.suffix))))
+
+    def __iter__(self):
+        """
+        Iterate over the stored keys.
+
+        :return iterator of string keys
+        """
+        for filename in glob(join(self.path, '*.{}'.format(self.suffix))):
+            yield basename(filename)[:-len(self.suffix) - 1]
@@ -1,3 +1,4 @@
+from sys import exc_info
 from json import loads, dumps
 from six import reraise
 from pystorage.providers.storage_service import StorageService
@@ -41,10 +42,13 @@ class RedisJSONStorageService(StorageService):
         :param key: string|numeric value used as unique key.
         :raise KeyError if the key/file was not found or is expired.
         """
+        value = self.redis_client.get(key)
+        if value is None:
+            raise KeyError(key)
         try:
-            return loads(self.redis_client.get(key))
-        except (KeyError, IOError, UnicodeDecodeError, AttributeError, EOFError, ImportError, IndexError):
-            reraise(KeyError, KeyError("Error opening the content from {}".format(filename)), exc_info()[2])
+            return loads(value)
+        except (KeyError, IOError, UnicodeDecodeError, ValueError, AttributeError, EOFError, ImportError, IndexError):
+            reraise(KeyError, KeyError("Error opening the content from {}".format(key)), exc_info()[2])
 
     def __setitem__(self, key, value):
         """
@@ -67,7 +71,7 @@ class RedisJSONStorageService(StorageService):
         :param key: string|integer key
         :return True if the key exists, False otherwise
         """
-        return self.redis_client.exists(key)
+        return bool(self.redis_client.exists(key))
 
     def __delitem__(self, key):
         """
@@ -85,3 +89,12 @@ class RedisJSONStorageService(StorageService):
         :return integer with the length of the collection
         """
         return len(self.redis_client.keys())
+
+    def __iter__(self):
+        """
+        Iterate over the stored keys using SCAN, without blocking the server.
+        Note: Redis returns the keys as bytes.
+
+        :return iterator of keys
+        """
+        return self.redis_client.scan_iter()
@@ -39,7 +39,10 @@ class RedisStorageService(StorageService):
         :param key: string|numeric value used as unique key.
         :raise KeyError if the key/file was not found or is expired.
         """
-        return self.redis_client.get(key)
+        value = self.redis_client.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
 
     def __setitem__(self, key, value):
         """
@@ -58,7 +61,7 @@ class RedisStorageService(StorageService):
         :param key: string|integer key
         :return True if the key exists, False otherwise
         """
-        return self.redis_client.exists(key)
+        return bool(self.redis_client.exists(key))
 
     def __delitem__(self, key):
         """
@@ -76,3 +79,12 @@ class RedisStorageService(StorageService):
         :return integer with the length of the collection
         """
         return len(self.redis_client.keys())
+
+    def __iter__(self):
+        """
+        Iterate over the stored keys using SCAN, without blocking the server.
+        Note: Redis returns the keys as bytes.
+
+        :return iterator of keys
+        """
+        return self.redis_client.scan_iter()
@@ -82,3 +82,12 @@ class S3StorageService(StorageService):
         :return integer with the length of the collection
         """
         return len([_ for _ in self.bucket.objects.all() if self.folder in _.key])
+
+    def __iter__(self):
+        """
+        Iterate over the stored keys.
+
+        :return iterator of string keys
+        """
+        for obj in self.bucket.objects.filter(Prefix=self.folder):
+            yield obj.key[len(self.folder):]
@@ -0,0 +1,253 @@
+from bisect import bisect
+from hashlib import blake2b
+from itertools import chain
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from pystorage.errors import StorageProviderError
+from pystorage.providers.storage_service import StorageService
+
+# Minimum number of threads of the fan out pool, so shards added later still run in parallel
+FAN_OUT_WORKERS = 16
+
+
+class ShardedStorageService(StorageService):
+    """
+    Sharded Storage Service
+    =======================
+    Split the keys across several storages (for example RedisStorageService or PickleStorageService
+    instances) using consistent hashing. Every shard owns many points (virtual nodes) in a hash ring
+    and a key belongs to the shard owning the first point after the key hash. Adding or removing
+    a shard only moves the keys of its points, about 1/N of them, instead of remapping almost
+    every key as the modulo hashing does.
+
+    Batch operations fan out to the shards in parallel and len()/iteration aggregate all of them.
+    The service is thread safe: the ring is replaced as a whole when shards are added or removed,
+    and every operation uses the ring it read first. close() stops the fan out threads.
+
+    Example:
+        storage = ShardedStorageService({
+            'redis-a': RedisStorageService(redis.from_url('redis://a:6379')),
+            'redis-b': RedisStorageService(redis.from_url('redis://b:6379')),
+        })
+        storage['hello'] = 'world'            # Stored in one of the shards
+        storage.get_many(['hello', 'other'])  # One get_many per shard, in parallel
+
+    Note: Keys are not migrated when shards are added or removed, moved keys become misses.
+    Name the shards (instead of passing a list) so the ring does not depend on their order.
+    """
+    def __init__(self, shards, replicas=100):
+        """
+        Initialize the ring with the given shards.
+
+        :param shards: dictionary of name: StorageService, or list of StorageService named by position.
+        :param replicas: number of virtual nodes per shard. More nodes spread the keys more evenly.
+        """
+        if not hasattr(shards, 'items'):
+            shards = {str(position): shard for position, shard in enumerate(shards)}
+        self.replicas = replicas
+        self.lock = Lock()
+        self.executor = None
+        self.ring = self.build_ring(dict(shards))
+
+    def __getitem__(self, key):
+        """
+        Lookup/Retrieve a value from the shard owning the key.
+
+        :param key: string|numeric value used as unique key.
+        :raise KeyError if the key was not found
+        """
+        return self.shard_for(key)[key]
+
+    def __setitem__(self, key, value):
+        """
+        Insert a key/value pair into the shard owning the key.
+
+        :param key: string|integer key
+        :param value: object to store
+        """
+        self.shard_for(key)[key] = value
+
+    def __contains__(self, key):
+        """
+        Test for membership in the shard owning the key.
+
+        :param key: string|integer key
+        :return True if the key exists, False otherwise
+        """
+        return key in self.shard_for(key)
+
+    def __delitem__(self, key):
+        """
+        Remove an item from the shard owning the key.
+
+        :param key: string|integer key
+        """
+        del self.shard_for(key)[key]
+
+    def __len__(self):
+        """
+        Returns the number of items stored in all the shards.
+
+        :return integer with the length of the collection
+        """
+        return sum(self.fan_out(len, [(shard,) for shard in self.shards.values()]))
+
+    def __iter__(self):
+        """
+        Iterate over the keys of all the shards, one shard after the other.
+        """
+        return chain.from_iterable(self.shards.values())
+
+    def get_many(self, keys):
+        """
+        Retrieve several values with one get_many per shard, running in parallel.
+
+        :param keys: iterable of keys
+        :return dictionary with the found key/value pairs
+        """
+        values = {}
+        for found in self.fan_out(lambda shard, group: shard.get_many(group), self.group(keys)):
+            values.update(found)
+        return values
+
+    def set_many(self, items):
+        """
+        Insert several key/value pairs with one set_many per shard, running in parallel.
+
+        :param items: dictionary or iterable of (key, value) pairs
+        """
+        if hasattr(items, 'items'):
+            items = items.items()
+        ring = self.ring
+        groups = {}
+        for key, value in items:
+            groups.setdefault(self.owner(key, ring), []).append((key, value))
+        self.fan_out(
+            lambda shard, group: shard.set_many(group),
+            [(ring[2][name], group) for name, group in groups.items()]
+        )
+
+    def delete_many(self, keys):
+        """
+        Remove several items with one delete_many per shard, running in parallel.
+
+        :param keys: iterable of keys
+        """
+        self.fan_out(lambda shard, group: shard.delete_many(group), self.group(keys))
+
+    def add_shard(self, name, shard):
+        """
+        Add a new shard to the ring. Only the keys falling on its virtual nodes move to it.
+
+        :param name: unique shard name
+        :param shard: StorageService instance
+        :returns self for concatenation
+        """
+        with self.lock:
+            shards = dict(self.shards)
+            shards[name] = shard
+            self.ring = self.build_ring(shards)
+        return self
+
+    def remove_shard(self, name):
+        """
+        Remove a shard from the ring. Its keys move to the rest of the shards.
+
+        :param name: shard name
+        :returns the removed StorageService
+        """
+        with self.lock:
+            shards = dict(self.shards)
+            shard = shards.pop(name)
+            self.ring = self.build_ring(shards)
+        return shard
+
+    def close(self):
+        """
+        Stop the fan out threads. A later batch operation starts them again.
+        """
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    @property
+    def shards(self):
+        """
+        Dictionary of name: StorageService of the current ring. Do not modify it, use add_shard()
+        and remove_shard().
+        """
+        return self.ring[2]
+
+    def shard_for(self, key):
+        """
+        Return the shard owning a key.
+
+        :param key: string|integer key
+        :return StorageService instance
+        """
+        ring = self.ring
+        return ring[2][self.owner(key, ring)]
+
+    def owner(self, key, ring=None):
+        """
+        Return the name of the shard owning a key.
+
+        :param key: string|integer key
+        :param ring: (points, owners, shards) tuple, the current ring by default
+        :return shard name
+        """
+        points, owners, _ = ring or self.ring
+        return owners[bisect(points, ring_hash(key)) % len(owners)]
+
+    def build_ring(self, shards):
+        """
+        Build the ring of a set of shards.
+
+        :return (points, owners, shards) tuple, published at once so readers never mix two rings
+        """
+        if not shards:
+            raise StorageProviderError("A sharded storage needs at least one shard")
+        ring = sorted(
+            (ring_hash('{}#{}'.format(name, replica)), name)
+            for name in shards for replica in range(self.replicas)
+        )
+        return [point for point, _ in ring], [name for _, name in ring], shards
+
+    def group(self, keys):
+        """
+        Group the keys by owner shard.
+
+        :return list of (shard, keys) tuples
+        """
+        ring = self.ring
+        groups = {}
+        for key in keys:
+            groups.setdefault(self.owner(key, ring), []).append(key)
+        return [(ring[2][name], group) for name, group in groups.items()]
+
+    def fan_out(self, function, calls):
+        """
+        Run function(*arguments) for every arguments tuple, in parallel when there is more than one.
+
+        :return list of results in the same order
+        """
+        if len(calls) <= 1:
+            return [function(*arguments) for arguments in calls]
+        executor = self.executor
+        if executor is None:
+            with self.lock:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(max_workers=max(len(self.shards), FAN_OUT_WORKERS))
+                executor = self.executor
+        return list(executor.map(lambda arguments: function(*arguments), calls))
+
+
+def ring_hash(key):
+    """
+    64 bits position of a key in the ring. Keys are hashed by their text,
+    so 'key' and b'key' (as returned by Redis) are the same.
+    """
+    if not isinstance(key, bytes):
+        key = str(key).encode('utf-8')
+    return int.from_bytes(blake2b(key, digest_size=8).digest(), 'little')
@@ -0,0 +1,129 @@
+from os import replace, remove, makedirs, getpid
+from os.path import dirname, isfile
+from threading import Thread, Event, get_ident
+from pickle import Pickler, Unpickler, HIGHEST_PROTOCOL
+from pystorage.errors import StorageProviderError
+
+SNAPSHOT_MAGIC = b'PYSSNAP1'
+SNAPSHOT_BUFFER = 1024 * 1024
+
+
+class SnapshotMixin(object):
+    """
+    Snapshot Mixin
+    ==============
+    Save the content of an in-memory storage into a single file and load it back, so a new
+    process starts with a warm cache instead of an empty one.
+
+    The file is a header followed by a stream of pickled records, written to a temporary file
+    and atomically renamed, and read back record by record. Storages implement
+    snapshot_items() and restore_items(records) to define their records.
+
+    Example:
+        storage = LRUStorageService(memory_blocks=10000)
+        storage.restore('/var/cache/lru.snapshot')           # Warm start, if the file exists
+        storage.start_snapshots('/var/cache/lru.snapshot', interval=60)
+    """
+    def snapshot(self, path):
+        """
+        Write the content of the storage into path, replacing it atomically.
+        The temporary file is removed if the snapshot fails.
+
+        :param path: snapshot file
+        :return number of records written
+        """
+        records = self.snapshot_items()
+        makedirs(dirname(path) or '.', exist_ok=True)
+        # Unique per thread, a periodic snapshot and a manual one can write the same path at once.
+        temporary = '{}.{}.{}.tmp'.format(path, getpid(), get_ident())
+        count = 0
+        try:
+            with open(temporary, 'wb', buffering=SNAPSHOT_BUFFER) as fp:
+                fp.write(SNAPSHOT_MAGIC)
+                pickler = Pickler(fp, protocol=HIGHEST_PROTOCOL)
+                for record in records:
+                    pickler.dump(record)
+                    # The memo would keep a reference to every record until the end.
+                    pickler.clear_memo()
+                    count += 1
+            replace(temporary, path)
+        except BaseException:
+            try:
+                remove(temporary)
+            except OSError:
+                pass
+            raise
+        return count
+
+    def restore(self, path):
+        """
+        Load a snapshot written by snapshot() into the storage.
+        A missing snapshot restores nothing, so it can be called on every start.
+
+        :param path: snapshot file
+        :return number of records read
+        :raise StorageProviderError if the file is not a valid snapshot
+        """
+        if not isfile(path):
+            return 0
+        with open(path, 'rb', buffering=SNAPSHOT_BUFFER) as fp:
+            if fp.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise StorageProviderError("{} is not a storage snapshot".format(path))
+            return self.restore_items(read_records(Unpickler(fp)))
+
+    def start_snapshots(self, path, interval=60):
+        """
+        Write a snapshot every interval seconds from a background thread.
+
+        :param path: snapshot file
+        :param interval: seconds between snapshots
+        """
+        self.stop_snapshots()
+        stopped = Event()
+
+        def run():
+            while not stopped.wait(interval):
+                try:
+                    self.snapshot(path)
+                except Exception:
+                    # Keep the previous snapshot and try again on the next interval. Values that
+                    # can not be pickled raise TypeError or AttributeError, not only PickleError.
+                    pass
+
+        self.snapshots = (stopped, Thread(target=run, daemon=True))
+        self.snapshots[1].start()
+
+    def stop_snapshots(self):
+        """
+        Stop the periodic snapshots, if any.
+        """
+        snapshots = getattr(self, 'snapshots', None)
+        if snapshots is not None:
+            snapshots[0].set()
+            snapshots[1].join()
+            self.snapshots = None
+
+    def snapshot_items(self):
+        """
+        Return an iterable of picklable records describing the storage content.
+        """
+        raise NotImplementedError
+
+    def restore_items(self, records):
+        """
+        Load the records returned by snapshot_items() into the storage.
+
+        :return number of records read
+        """
+        raise NotImplementedError
+
+
+def read_records(unpickler):
+    """
+    Iterate over the records of a snapshot stream.
+    """
+    while True:
+        try:
+            yield unpickler.load()
+        except EOFError:
+            return
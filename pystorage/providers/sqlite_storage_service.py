@@ -0,0 +1,270 @@
+import json
+import gzip
+import sqlite3
+from os import makedirs, getpid
+from os.path import dirname
+from sys import exc_info
+from time import time
+from threading import local
+from pickle import PickleError, dumps, loads, HIGHEST_PROTOCOL
+from six import reraise
+from pystorage.errors import StorageProviderError
+from pystorage.providers.storage_service import StorageService
+
+CODECS = {
+    'pickle': (
+        lambda value: dumps(value, protocol=HIGHEST_PROTOCOL),
+        loads
+    ),
+    'pickle.gzip': (
+        lambda value: gzip.compress(dumps(value, protocol=HIGHEST_PROTOCOL)),
+        lambda content: loads(gzip.decompress(content))
+    ),
+    'json': (
+        json.dumps,
+        json.loads
+    )
+}
+BATCH_SIZE = 500
+# json.JSONDecodeError is a ValueError, gzip.BadGzipFile an OSError
+DECODE_ERRORS = (PickleError, ValueError, OSError, EOFError, AttributeError, ImportError, IndexError)
+
+
+class SQLiteStorageService(StorageService):
+    """
+    SQLite Storage Service
+    ======================
+    Embedded storage for millions of small entries in a single SQLite database file.
+    Multiple threads and processes on the same host can share it: the database runs in WAL mode,
+    so readers never block writers, and every thread reuses its own connection.
+
+    Values are encoded with the same codecs as the file storages: 'pickle', 'pickle.gzip' or 'json'.
+    An optional expiration is kept in an indexed column, expired values are never returned
+    and purge() removes all of them with a single range delete.
+
+    Example:
+        storage = SQLiteStorageService(path='/tmp/cache.sqlite', expiration=3600)
+        storage['hello'] = 'world'
+        storage.set_many({'a': 1, 'b': 2})   # One transaction
+        storage.get_many(['a', 'b', 'c'])    # {'a': 1, 'b': 2}
+        storage.purge()                      # Remove the expired values
+    """
+    def __init__(self, path='/tmp/storage.sqlite', table='storage', codec='pickle', expiration=None, timeout=30):
+        """
+        Initialize the Storage creating the database and table if they do not exist.
+
+        :param path: database file
+        :param table: table name, so several storages can share a database
+        :param codec: 'pickle', 'pickle.gzip' or 'json'
+        :param expiration: seconds to keep the values alive. None means that they never expire.
+        :param timeout: seconds to wait for the database lock held by another connection
+        """
+        try:
+            self.encode, self.decode = CODECS[codec]
+        except KeyError:
+            raise StorageProviderError("The codec {} was not recognized".format(codec))
+        self.path = path
+        self.table = table
+        self.codec = codec
+        self.expiration = expiration
+        self.timeout = timeout
+        self.local = local()
+        self.select_sql = 'SELECT value FROM "{}" WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)'.format(table)
+        self.select_many_sql = 'SELECT key, value FROM "{}" WHERE key IN ({{}}) AND (expires_at IS NULL OR expires_at > ?)'.format(table)
+        self.exists_sql = 'SELECT 1 FROM "{}" WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)'.format(table)
+        self.upsert_sql = 'INSERT OR REPLACE INTO "{}" (key, value, expires_at) VALUES (?, ?, ?)'.format(table)
+        self.delete_sql = 'DELETE FROM "{}" WHERE key = ?'.format(table)
+        self.count_sql = 'SELECT COUNT(*) FROM "{}" WHERE expires_at IS NULL OR expires_at > ?'.format(table)
+        self.keys_sql = 'SELECT key FROM "{}" WHERE (?1 IS NULL OR key > ?1) AND (expires_at IS NULL OR expires_at > ?2) ORDER BY key LIMIT ?3'.format(table)
+        self.purge_sql = 'DELETE FROM "{}" WHERE expires_at <= ?'.format(table)
+        connection = self.connection()
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS "{}" (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL) '
+            'WITHOUT ROWID'.format(table)
+        )
+        connection.execute('CREATE INDEX IF NOT EXISTS "{0}_expires_at" ON "{0}" (expires_at)'.format(table))
+
+    def connection(self):
+        """
+        Return the connection of the current thread, opening it if needed.
+        Connections are not shared across threads nor inherited by forked processes.
+
+        :return sqlite3.Connection in autocommit mode
+        """
+        connection = getattr(self.local, 'connection', None)
+        if connection is None or self.local.pid != getpid():
+            makedirs(dirname(self.path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, cached_statements=256)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+            self.local.pid = getpid()
+        return connection
+
+    def close(self):
+        """
+        Close the connection of the current thread.
+        """
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+    def __getitem__(self, key):
+        """
+        Lookup/Retrieve a value given its key and raise KeyError if not present.
+
+        :param key: string|numeric value used as unique key.
+        :raise KeyError if the key was not found or is expired
+        """
+        row = self.connection().execute(self.select_sql, (str(key), time())).fetchone()
+        if row is None:
+            raise KeyError(key)
+        try:
+            return self.decode(row[0])
+        except DECODE_ERRORS:
+            reraise(KeyError, KeyError("Error decoding the content of {}".format(key)), exc_info()[2])
+
+    def __setitem__(self, key, value):
+        """
+        Insert a key/value pair into the storage.
+
+        :param key: string|integer key
+        :param value: object to store
+        :raise KeyError if there was a problem saving the key/value
+        """
+        try:
+            self.connection().execute(self.upsert_sql, self.row(key, value, time()))
+        except (sqlite3.Error, PickleError, TypeError, ValueError):
+            reraise(KeyError, KeyError("Error saving the content of {}".format(key)), exc_info()[2])
+
+    def __contains__(self, key):
+        """
+        Test for membership without decoding the value.
+
+        :param key: string|integer key
+        :return True if the key exists, False otherwise
+        """
+        return self.connection().execute(self.exists_sql, (str(key), time())).fetchone() is not None
+
+    def __delitem__(self, key):
+        """
+        Remove an item from the storage.
+
+        :param key: string|integer key
+        :raise KeyError if the key was not found
+        """
+        if self.connection().execute(self.delete_sql, (str(key),)).rowcount == 0:
+            raise KeyError(key)
+
+    def __len__(self):
+        """
+        Returns the number of items stored, not counting the expired ones.
+
+        :return integer with the length of the collection
+        """
+        return self.connection().execute(self.count_sql, (time(),)).fetchone()[0]
+
+    def __iter__(self):
+        """
+        Iterate over the stored keys, not including the expired ones. Keys are read in batches
+        in key order, so the memory does not grow with the table and no read transaction is
+        kept open between batches.
+
+        :return iterator of string keys
+        """
+        now = time()
+        last = None
+        while True:
+            rows = self.connection().execute(self.keys_sql, (last, now, BATCH_SIZE)).fetchall()
+            for row in rows:
+                yield row[0]
+            if len(rows) < BATCH_SIZE:
+                return
+            last = rows[-1][0]
+
+    def get_many(self, keys):
+        """
+        Retrieve several values with one query per batch of keys.
+        Missing, expired and undecodable keys are not included in the result, like the keys
+        for which __getitem__ raises KeyError in StorageService.get_many.
+
+        :param keys: iterable of keys
+        :return dictionary with the found key/value pairs, using the keys as they were given
+        """
+        # Keys are stored as text, the result must use the keys of the caller (1, not '1')
+        originals = {}
+        for key in keys:
+            originals.setdefault(str(key), []).append(key)
+        keys = list(originals)
+        now = time()
+        connection = self.connection()
+        values = {}
+        for start in range(0, len(keys), BATCH_SIZE):
+            batch = keys[start:start + BATCH_SIZE]
+            sql = self.select_many_sql.format(', '.join('?' * len(batch)))
+            for key, value in connection.execute(sql, batch + [now]):
+                try:
+                    value = self.decode(value)
+                except DECODE_ERRORS:
+                    continue
+                for original in originals[key]:
+                    values[original] = value
+        return values
+
+    def set_many(self, items):
+        """
+        Insert several key/value pairs in a single transaction.
+
+        :param items: dictionary or iterable of (key, value) pairs
+        :raise KeyError if there was a problem saving the values, nothing is saved in that case
+        """
+        if hasattr(items, 'items'):
+            items = items.items()
+        now = time()
+        try:
+            rows = [self.row(key, value, now) for key, value in items]
+            with self.transaction() as connection:
+                connection.executemany(self.upsert_sql, rows)
+        except (sqlite3.Error, PickleError, TypeError, ValueError):
+            reraise(KeyError, KeyError("Error saving the content"), exc_info()[2])
+
+    def delete_many(self, keys):
+        """
+        Remove several items in a single transaction. Missing keys are ignored.
+
+        :param keys: iterable of keys
+        """
+        with self.transaction() as connection:
+            connection.executemany(self.delete_sql, [(str(key),) for key in keys])
+
+    def purge(self):
+        """
+        Remove all the expired values using the expiration index.
+
+        :return number of removed values
+        """
+        return self.connection().execute(self.purge_sql, (time(),)).rowcount
+
+    def row(self, key, value, now):
+        expires_at = None if self.expiration is None else now + self.expiration
+        return str(key), self.encode(value), expires_at
+
+    def transaction(self):
+        return Transaction(self.connection())
+
+
+class Transaction(object):
+    """
+    Context manager that runs the enclosed statements in a single write transaction.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute('BEGIN IMMEDIATE')
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute('COMMIT' if exc_type is None else 'ROLLBACK')
+        return False
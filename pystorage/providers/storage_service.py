@@ -5,6 +5,10 @@ class StorageService(object):
     Define an abstract interface for all the storage services using the Python container types.
     You should inherit from this class if you want to define your own storage methodology.
     """
+    # Storages keeping their values in the process memory never block, so the async
+    # callers (like pystorage.cached) access them directly instead of through a thread pool.
+    in_memory = False
+
     def __getitem__(self, key):
         """
         Called to implement evaluation of self[key]:
@@ -41,3 +45,50 @@ class StorageService(object):
         Should return the length of the object, an integer >= 0
         """
         raise NotImplementedError
+
+    def __iter__(self):
+        """
+        Called when an iterator is required for the storage.
+        Should return an iterator over the stored keys.
+        """
+        raise NotImplementedError
+
+    def get_many(self, keys):
+        """
+        Retrieve several values at once. Storages with a faster batch access should override it.
+        Missing keys are not included in the result.
+
+        :param keys: iterable of keys
+        :return dictionary with the found key/value pairs
+        """
+        values = {}
+        for key in keys:
+            try:
+                values[key] = self[key]
+            except KeyError:
+                pass
+        return values
+
+    def set_many(self, items):
+        """
+        Insert several key/value pairs at once. Storages with a faster batch access should override it.
+
+        :param items: dictionary or iterable of (key, value) pairs
+        """
+        if hasattr(items, 'items'):
+            items = items.items()
+        for key, value in items:
+            self[key] = value
+
+    def delete_many(self, keys):
+        """
+        Remove several items at once. Missing keys are ignored.
+        Storages with a faster batch access should override it.
+
+        :param keys: iterable of keys
+        """
+        for key in keys:
+            try:
+                del self[key]
+            except (KeyError, FileNotFoundError):
+                pass
@@ -0,0 +1,164 @@
+import atexit
+from os import makedirs
+from os.path import dirname
+from time import time
+from struct import Struct
+from hashlib import blake2b
+from threading import Lock
+from pystorage.providers.storage_service import StorageService
+
+# Every access is a little-endian record of: key hash (u64), operation (u8), size (u32), timestamp (f64)
+TRACE_RECORD = Struct('<QBId')
+OP_GET = 0
+OP_SET = 1
+OP_DELETE = 2
+OP_CONTAINS = 3
+MAX_SIZE = 2 ** 32 - 1
+
+
+class TraceStorageService(StorageService):
+    """
+    Trace Storage Service
+    =====================
+    Wrap any storage and record every access into a compact binary trace file: 21 bytes per access
+    with the key hash, the operation, the value size and the timestamp. Replay the trace with
+    pystorage.simulator to choose the size and eviction policy of a cache from real traffic.
+
+    Records are buffered in memory and appended to the file in blocks, call close() (done at exit
+    too) to write the last ones. A failed lookup is recorded as a get with size 0.
+
+    Example:
+        storage = TraceStorageService(LRUStorageService(memory_blocks=1000), path='/tmp/lru.trace')
+        ...
+        storage.close()
+
+        from pystorage.simulator import read_trace, simulate
+        curve = simulate(read_trace('/tmp/lru.trace'), capacities=[100, 1000, 10000])
+
+    By default only the size of bytes and strings is known, pass a sizer (for example
+    lambda value: len(pickle.dumps(value))) to measure any value.
+    """
+    def __init__(self, storage, path='/tmp/storage.trace', sizer=None, buffer=4096):
+        """
+        :param storage: StorageService to wrap
+        :param path: trace file, new records are appended to it
+        :param sizer: callable returning the size in bytes of a value
+        :param buffer: number of records kept in memory before writing them
+        """
+        self.storage = storage
+        self.path = path
+        self.sizer = sizer or default_sizer
+        self.buffer = buffer
+        self.records = []
+        self.lock = Lock()
+        makedirs(dirname(path) or '.', exist_ok=True)
+        self.file = open(path, 'ab')
+        atexit.register(self.close)
+
+    def __getitem__(self, key):
+        """
+        Lookup/Retrieve a value from the underlying storage, recording the access.
+
+        :param key: string|numeric value used as unique key.
+        :raise KeyError if the key was not found
+        """
+        try:
+            value = self.storage[key]
+        except KeyError:
+            self.record(OP_GET, key, 0)
+            raise
+        self.record(OP_GET, key, self.sizer(value))
+        return value
+
+    def __setitem__(self, key, value):
+        """
+        Insert a key/value pair into the underlying storage, recording the access.
+
+        :param key: string|integer key
+        :param value: object to store
+        """
+        self.storage[key] = value
+        self.record(OP_SET, key, self.sizer(value))
+
+    def __contains__(self, key):
+        """
+        Test for membership in the underlying storage, recording the access.
+
+        :param key: string|integer key
+        :return True if the key exists, False otherwise
+        """
+        self.record(OP_CONTAINS, key, 0)
+        return key in self.storage
+
+    def __delitem__(self, key):
+        """
+        Remove an item from the underlying storage, recording the access.
+
+        :param key: string|integer key
+        """
+        del self.storage[key]
+        self.record(OP_DELETE, key, 0)
+
+    def __len__(self):
+        """
+        Returns the number of items stored in the underlying storage. Not recorded.
+
+        :return integer with the length of the collection
+        """
+        return len(self.storage)
+
+    def __iter__(self):
+        """
+        Iterate over the keys of the underlying storage. Not recorded.
+        """
+        return iter(self.storage)
+
+    def record(self, op, key, size):
+        """
+        Buffer a trace record, writing the buffer when it is full.
+        """
+        record = TRACE_RECORD.pack(key_hash(key), op, min(size, MAX_SIZE), time())
+        with self.lock:
+            self.records.append(record)
+            if len(self.records) >= self.buffer:
+                self.write()
+
+    def flush(self):
+        """
+        Write the buffered records to the trace file.
+        """
+        with self.lock:
+            self.write()
+            self.file.flush()
+
+    def close(self):
+        """
+        Write the buffered records and close the trace file. Called at exit too.
+        """
+        atexit.unregister(self.close)
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+
+    def write(self):
+        self.file.write(b''.join(self.records))
+        self.records = []
+
+
+def key_hash(key):
+    """
+    64 bits hash of a key. Keys are hashed by their text, so 'key' and b'key' are the same.
+    """
+    if not isinstance(key, bytes):
+        key = str(key).encode('utf-8')
+    return int.from_bytes(blake2b(key, digest_size=8).digest(), 'little')
+
+
+def default_sizer(value):
+    """
+    Size of bytes-like and string values, 0 for the rest of them.
+    """
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    return 0
@@ -1,9 +1,10 @@
 from time import time
 from threading import RLock
 from pystorage.providers.storage_service import StorageService
+from pystorage.providers.snapshot import SnapshotMixin
 
 
-class VolatileStorageService(StorageService):
+class VolatileStorageService(SnapshotMixin, StorageService):
     """
     Volatile Storage Service
     ========================
@@ -18,17 +19,23 @@ class VolatileStorageService(StorageService):
         # After five seconds ( expiration time ) the value will be deleted
         assert 'the_key' not in storage['the_key']
 
+    The content can be saved with snapshot(path) and loaded with restore(path) keeping the
+    remaining time to live of every value.
+
     Note: Iteration over dict and also keys() do not remove expired values!
     """
-    def __init__(self, storage={}, expiration=3600):
+    in_memory = True
+
+    def __init__(self, storage=None, expiration=3600):
         """
         Initialize the Storage with a Thread locking mechanism. Also, sets the expiration in
         seconds. The stored values not live more than that time.
 
+        :param storage: dictionary holding the values, a new one by default.
         :param expiration: seconds to keep the value alive.
         """
         self.expiration = expiration
-        self.storage = storage
+        self.storage = {} if storage is None else storage
         self.lock = RLock()
 
     def __getitem__(self, key):
@@ -88,3 +95,37 @@ class VolatileStorageService(StorageService):
         """
         with self.lock:
             return len(self.storage)
+
+    def __iter__(self):
+        """
+        Iterate over the stored keys.
+        Note: It does not remove expired values!
+
+        :return iterator of keys
+        """
+        with self.lock:
+            return iter(list(self.storage))
+
+    def snapshot_items(self):
+        """
+        Snapshot records are (key, value, stored) tuples, where stored is the timestamp when the
+        value was saved. Expired values are skipped.
+        """
+        with self.lock:
+            entries = [(key, self.storage[key]) for key in list(self.storage)]
+        now = time()
+        return [(key, value, stored) for key, (stored, value) in entries if now - stored <= self.expiration]
+
+    def restore_items(self, records):
+        """
+        Insert the snapshot records keeping their original expiration time, so the time the
+        snapshot spent on disk counts. The values that expired meanwhile are skipped.
+        """
+        now = time()
+        count = 0
+        with self.lock:
+            for key, value, stored in records:
+                count += 1
+                if now - stored <= self.expiration:
+                    self.storage[key] = (stored, value)
+        return count
@@ -1,13 +1,8 @@
+from functools import lru_cache
+from importlib import import_module
 from pystorage.errors import StorageProviderError
-from pystorage.providers.gzip_pickle_storage_service import GZipPickleStorageService
-from pystorage.providers.volatile_storage_service import VolatileStorageService
-from pystorage.providers.lru_storage_service import LRUStorageService
-from pystorage.providers.json_storage_service import JSONStorageService
-from pystorage.providers.pickle_storage_service import PickleStorageService
-from pystorage.providers.s3_storage_service import S3StorageService
-from pystorage.providers.disklru_storage_service import DiskLRUStorageService
-from pystorage.providers.redis_storage_service import RedisStorageService
-from pystorage.providers.redis_json_storage_service import RedisJSONStorageService
+
+ENTRY_POINT_GROUP = 'pystorage.providers'
 
 
 class StorageProvider(object):
@@ -17,6 +12,12 @@ class StorageProvider(object):
     It's a factory instance that you can use to create and instantiate new storages.
     As a good practive, any new storage instance must be created through this provider.
     Also, it provides the mechanisms to extend registering new storages and use them.
+
+    Storages are referenced by their import path ("module:Class") and only imported when they
+    are created, so importing the provider is cheap. Third-party packages can publish their
+    storages in the "pystorage.providers" entry point group:
+
+        setup(..., entry_points={'pystorage.providers': ['storage.mine = my_package.storage:MyStorage']})
     """
     STORAGE_LRU = 'storage.lru'
     STORAGE_JSON = 'storage.json'
@@ -27,22 +28,36 @@ class StorageProvider(object):
     STORAGE_DISKLRU = 'storage.disklru'
     STORAGE_REDIS = 'storage.redis'
     STORAGE_REDIS_JSON = 'storage.redis.json'
+    STORAGE_BLOOM = 'storage.bloom'
+    STORAGE_SQLITE = 'storage.sqlite'
+    STORAGE_SHARDED = 'storage.sharded'
+    STORAGE_DEDUP = 'storage.dedup'
+    STORAGE_TRACE = 'storage.trace'
+    STORAGE_NUMPY = 'storage.numpy'
+
+    BUILTIN_PROVIDERS = {
+        STORAGE_PICKLE_GZIP: 'pystorage.providers.gzip_pickle_storage_service:GZipPickleStorageService',
+        STORAGE_VOLATILE: 'pystorage.providers.volatile_storage_service:VolatileStorageService',
+        STORAGE_LRU: 'pystorage.providers.lru_storage_service:LRUStorageService',
+        STORAGE_JSON: 'pystorage.providers.json_storage_service:JSONStorageService',
+        STORAGE_PICKLE: 'pystorage.providers.pickle_storage_service:PickleStorageService',
+        STORAGE_S3: 'pystorage.providers.s3_storage_service:S3StorageService',
+        STORAGE_DISKLRU: 'pystorage.providers.disklru_storage_service:DiskLRUStorageService',
+        STORAGE_REDIS: 'pystorage.providers.redis_storage_service:RedisStorageService',
+        STORAGE_REDIS_JSON: 'pystorage.providers.redis_json_storage_service:RedisJSONStorageService',
+        STORAGE_BLOOM: 'pystorage.providers.bloom_storage_service:BloomFilterStorageService',
+        STORAGE_SQLITE: 'pystorage.providers.sqlite_storage_service:SQLiteStorageService',
+        STORAGE_SHARDED: 'pystorage.providers.sharded_storage_service:ShardedStorageService',
+        STORAGE_DEDUP: 'pystorage.providers.dedup_storage_service:DedupStorageService',
+        STORAGE_TRACE: 'pystorage.providers.trace_storage_service:TraceStorageService',
+        STORAGE_NUMPY: 'pystorage.providers.numpy_storage_service:NumpyStorageService'
+    }
 
     def __init__(self):
         """
         Initialize the StorageProvider with a couple of know storage methods.
         """
-        self.providers = {
-            self.STORAGE_PICKLE_GZIP: GZipPickleStorageService,
-            self.STORAGE_VOLATILE: VolatileStorageService,
-            self.STORAGE_LRU: LRUStorageService,
-            self.STORAGE_JSON: JSONStorageService,
-            self.STORAGE_PICKLE: PickleStorageService,
-            self.STORAGE_S3: S3StorageService,
-            self.STORAGE_DISKLRU: DiskLRUStorageService,
-            self.STORAGE_REDIS: RedisStorageService,
-            self.STORAGE_REDIS_JSON: RedisJSONStorageService
-        }
+        self.providers = dict(self.BUILTIN_PROVIDERS)
 
     def register(self, name, provider):
         """
@@ -51,9 +66,10 @@ class StorageProvider(object):
 
         :example
             provider = StorageProvider().register('my.storage', MyStorage)
+            provider = StorageProvider().register('my.storage', 'my_package.storage:MyStorage')
 
         :param name: the provider name. Please, use the convention. <type>.<name>
-        :param provider: the provider class
+        :param provider: the provider class, or its "module:Class" import path to import it lazily
         :returns self for concatenation
         """
         self.providers[name] = provider
@@ -64,8 +80,44 @@ class StorageProvider(object):
         Create a new instance of a Storage given by the name.
         *args and **kwargs are passed directly to the class constructor to
         generate the new instance.
+        Only the module of the created storage is imported. Names not registered in
+        the provider are looked up in the "pystorage.providers" entry point group.
         """
-        try:
-            return self.providers[name](*args, **kwargs)
-        except KeyError:
+        provider = self.providers.get(name) or discover().get(name)
+        if provider is None:
             raise StorageProviderError("The storage method {} was not recognized".format(name))
+        if isinstance(provider, str):
+            provider = resolve(provider)
+        return provider(*args, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def resolve(path):
+    """
+    Import a storage class given its "module:Class" path. Results are cached.
+
+    :param path: import path
+    :return the storage class
+    """
+    module, _, attribute = path.partition(':')
+    try:
+        return getattr(import_module(module), attribute)
+    except (ImportError, AttributeError) as ex:
+        raise StorageProviderError("The storage {} could not be imported: {}".format(path, ex))
+
+
+@lru_cache(maxsize=1)
+def discover():
+    """
+    Read the storages published by the installed packages in the "pystorage.providers" entry
+    point group. The registry is read once and cached, call discover.cache_clear() to read it again.
+
+    :return dictionary of name: "module:Class" import path
+    """
+    from importlib.metadata import entry_points
+    found = entry_points()
+    if hasattr(found, 'select'):
+        found = found.select(group=ENTRY_POINT_GROUP)
+    else:
+        found = found.get(ENTRY_POINT_GROUP, [])
+    return {entry_point.name: entry_point.value for entry_point in found}
@@ -0,0 +1,107 @@
+import os
+import atexit
+from pystorage.providers.bloom_storage_service import BloomFilterStorageService
+from pystorage.providers.pickle_storage_service import PickleStorageService
+
+
+class CountingStorage(PickleStorageService):
+    """
+    Pickle storage counting the membership checks that reach it.
+    """
+    checks = 0
+
+    def __contains__(self, key):
+        self.checks += 1
+        return super(CountingStorage, self).__contains__(key)
+
+
+def test_misses_do_not_reach_the_storage(tmp_path):
+    """
+    Definite misses should be answered by the filter without asking the storage.
+    """
+    inner = CountingStorage(path=str(tmp_path))
+    storage = BloomFilterStorageService(inner, capacity=1000)
+    storage['hello'] = 'world'
+    assert 'hello' in storage
+    assert storage['hello'] == 'world'
+    assert inner.checks == 1
+    assert sum(1 for i in range(1000) if 'missing.{}'.format(i) in storage) == 0
+    assert inner.checks < 100
+
+
+def test_filter_is_persisted_and_rebuilt(tmp_path):
+    """
+    A new instance should load the persisted filter, or rebuild it from the storage keys.
+    """
+    inner = PickleStorageService(path=str(tmp_path / 'data'))
+    path = str(tmp_path / 'keys.bloom')
+    storage = BloomFilterStorageService(inner, capacity=100, path=path)
+    storage['a'] = 1
+    storage.save()
+    inner['b'] = 2
+
+    loaded = BloomFilterStorageService(inner, capacity=100, path=path)
+    assert 'a' in loaded
+    assert loaded.might_contain('b') is False
+
+    loaded.rebuild()
+    assert 'b' in loaded
+
+
+def test_unsaved_insertions_are_not_lost(tmp_path):
+    """
+    A filter with insertions that were never saved should be rebuilt, not loaded.
+    """
+    inner = PickleStorageService(path=str(tmp_path / 'data'))
+    path = str(tmp_path / 'keys.bloom')
+    crashed = BloomFilterStorageService(inner, capacity=100, path=path)
+    crashed['a'] = 1
+
+    loaded = BloomFilterStorageService(inner, capacity=100, path=path)
+    assert 'a' in loaded
+    crashed.close()
+
+
+def test_save_merges_other_instances(tmp_path):
+    """
+    Saving should keep the bits saved by other instances on the same file.
+    """
+    inner = PickleStorageService(path=str(tmp_path / 'data'))
+    path = str(tmp_path / 'keys.bloom')
+    first = BloomFilterStorageService(inner, capacity=100, path=path)
+    second = BloomFilterStorageService(inner, capacity=100, path=path)
+    first['a'] = 1
+    second['b'] = 2
+    first.close()
+    second.close()
+    inner['c'] = 3
+
+    loaded = BloomFilterStorageService(inner, capacity=100, path=path)
+    assert 'a' in loaded and 'b' in loaded
+    assert loaded.might_contain('c') is False
+
+
+def crash(storage):
+    """
+    Simulate the exit of a process without saving: the marker lock is released, the file stays.
+    """
+    atexit.unregister(storage.close)
+    os.close(storage.marker[1])
+    storage.marker = None
+
+
+def test_rebuild_keeps_the_markers_of_running_writers(tmp_path):
+    """
+    A rebuild by another instance should not hide the later insertions of a writer that crashes.
+    """
+    inner = PickleStorageService(path=str(tmp_path / 'data'))
+    path = str(tmp_path / 'keys.bloom')
+    writer = BloomFilterStorageService(inner, capacity=100, path=path)
+    writer['k1'] = 1
+    BloomFilterStorageService(inner, capacity=100, path=path)
+    writer['k2'] = 2
+    crash(writer)
+
+    loaded = BloomFilterStorageService(inner, capacity=100, path=path)
+    assert 'k1' in loaded and 'k2' in loaded
+    assert os.listdir(path + '.writers') == []
@@ -0,0 +1,149 @@
+import asyncio
+import pytest
+from time import sleep
+from threading import Thread
+from pystorage.cached import cached, hash_arguments
+from pystorage.providers.lru_storage_service import LRUStorageService
+
+
+def test_cached_function_is_computed_only_once():
+    """
+    The second call with the same arguments should be served from the storage.
+    """
+    calls = []
+
+    @cached(LRUStorageService())
+    def add(a, b):
+        calls.append((a, b))
+        return a + b
+
+    assert add(1, 2) == 3
+    assert add(1, 2) == 3
+    assert add(2, 2) == 4
+    assert calls == [(1, 2), (2, 2)]
+
+
+def test_concurrent_callers_are_coalesced():
+    """
+    Many threads asking for the same missing key should trigger a single computation.
+    """
+    calls = []
+
+    @cached(LRUStorageService())
+    def slow(value):
+        calls.append(value)
+        sleep(0.2)
+        return value * 2
+
+    results = []
+    threads = [Thread(target=lambda: results.append(slow(21))) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [42] * 10
+    assert calls == [21]
+
+
+def test_async_concurrent_callers_are_coalesced():
+    """
+    Many tasks awaiting the same missing key should trigger a single computation.
+    """
+    calls = []
+
+    @cached(LRUStorageService(), ttl=60)
+    async def slow(value):
+        calls.append(value)
+        await asyncio.sleep(0.1)
+        return value * 2
+
+    async def main():
+        return await asyncio.gather(*[slow(21) for _ in range(10)])
+
+    assert asyncio.run(main()) == [42] * 10
+    assert calls == [21]
+
+
+def test_cancelled_async_caller_does_not_cancel_the_others():
+    """
+    Cancelling the task that started a computation should not fail the tasks waiting for it.
+    """
+    @cached(LRUStorageService(), ttl=60)
+    async def slow(value):
+        await asyncio.sleep(0.1)
+        return value * 2
+
+    async def main():
+        first = asyncio.ensure_future(slow(1))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(slow(1))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(main()) == (2, True)
+
+
+def test_arguments_hash_is_stable():
+    """
+    Dictionaries and sets with the same content should produce the same hash.
+    """
+    assert hash_arguments((1, {'a': 1, 'b': 2}), {}) == hash_arguments((1, {'b': 2, 'a': 1}), {})
+    assert hash_arguments(({'x', 'y'},), {}) == hash_arguments(({'y', 'x'},), {})
+    assert hash_arguments((1,), {}) != hash_arguments(((1,),), {})
+
+
+def test_stale_value_is_served_while_refreshing():
+    """
+    After the ttl the stale value should be returned immediately while a background refresh runs.
+    """
+    calls = []
+
+    @cached(LRUStorageService(), ttl=0.3, stale_ttl=10)
+    def version():
+        calls.append(1)
+        sleep(0.1)
+        return len(calls)
+
+    assert version() == 1
+    sleep(0.35)
+    assert version() == 1
+    sleep(0.2)
+    assert version() == 2
+    assert len(calls) == 2
+
+
+def test_early_refresh_happens_before_expiration():
+    """
+    With a big beta the value should be refreshed in background before the ttl is reached.
+    """
+    calls = []
+
+    @cached(LRUStorageService(), ttl=60, beta=1e6)
+    def version():
+        calls.append(1)
+        sleep(0.01)
+        return len(calls)
+
+    assert version() == 1
+    assert version() == 1
+    sleep(0.1)
+    assert len(calls) == 2
+
+
+def test_redis_lock_outlives_its_timeout():
+    """
+    A computation longer than lock_timeout should keep the Redis lock and return its result.
+    """
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    from pystorage.providers.redis_json_storage_service import RedisJSONStorageService
+    storage = RedisJSONStorageService(fakeredis.FakeRedis())
+
+    @cached(storage, ttl=60, lock_timeout=0.2)
+    def slow(value):
+        sleep(0.5)
+        return value * 2
+
+    assert slow(2) == 4
+    assert slow(2) == 4
@@ -0,0 +1,64 @@
+from pickle import dumps
+from pystorage.providers.dedup_storage_service import DedupStorageService, DIGEST_PROTOCOL
+from pystorage.providers.pickle_storage_service import PickleStorageService
+
+
+class CountingStorage(PickleStorageService):
+    """
+    Pickle storage counting the writes that reach it.
+    """
+    writes = 0
+
+    def __setitem__(self, key, value):
+        self.writes += 1
+        super(CountingStorage, self).__setitem__(key, value)
+
+
+def test_identical_values_are_stored_once(tmp_path):
+    """
+    Writing the same content under several keys should write a single blob.
+    """
+    blobs = CountingStorage(path=str(tmp_path / 'blobs'))
+    storage = DedupStorageService(blobs, PickleStorageService(path=str(tmp_path / 'references')))
+    storage['a'] = b'payload'
+    storage['b'] = b'payload'
+    storage['c'] = {'other': 'value'}
+    assert blobs.writes == 2
+    assert len(storage) == 3
+    assert storage['b'] == b'payload'
+    assert storage['c'] == {'other': 'value'}
+
+
+def test_collect_removes_unreferenced_blobs(tmp_path):
+    """
+    Only the blobs without references should be removed.
+    """
+    blobs = PickleStorageService(path=str(tmp_path / 'blobs'))
+    storage = DedupStorageService(blobs, PickleStorageService(path=str(tmp_path / 'references')))
+    storage['a'] = b'shared'
+    storage['b'] = b'shared'
+    storage['c'] = b'single'
+    del storage['a']
+    del storage['c']
+    assert storage.collect() == 1
+    assert len(blobs) == 1
+    assert storage['b'] == b'shared'
+
+
+def test_raw_and_pickled_values_do_not_collide(tmp_path):
+    """
+    bytes, bytearray and pickled values with the same content should be different blobs.
+    """
+    storage = DedupStorageService(
+        PickleStorageService(path=str(tmp_path / 'blobs')),
+        PickleStorageService(path=str(tmp_path / 'references'))
+    )
+    value = {'other': 'value'}
+    storage['object'] = value
+    storage['pickle'] = dumps(value, protocol=DIGEST_PROTOCOL)
+    storage['bytes'] = b'payload'
+    storage['bytearray'] = bytearray(b'payload')
+    assert storage['object'] == value
+    assert storage['pickle'] == dumps(value, protocol=DIGEST_PROTOCOL)
+    assert type(storage['bytes']) is bytes
+    assert type(storage['bytearray']) is bytearray
@@ -0,0 +1,71 @@
+from threading import Thread
+from pystorage.providers.file_locking import LOCK_FOLDER, LOCK_STRIPES
+from pystorage.providers.pickle_storage_service import PickleStorageService
+from pystorage.providers.disklru_storage_service import DiskLRUStorageService
+
+
+def run(*targets):
+    threads = [Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_readers_never_see_partial_values(tmp_path):
+    """
+    Readers of a key rewritten by several writers should always get a complete value.
+    """
+    storage = PickleStorageService(path=str(tmp_path), concurrent=True)
+    values = [bytes([value]) * 1000000 for value in range(4)]
+    storage['key'] = values[0]
+    errors = []
+
+    def write(value):
+        return lambda: [storage.__setitem__('key', value) for _ in range(20)]
+
+    def read():
+        for _ in range(100):
+            try:
+                assert storage['key'] in values
+            except (KeyError, AssertionError) as ex:
+                errors.append(ex)
+
+    run(read, read, *[write(value) for value in values])
+    assert errors == []
+    assert len(storage) == 1
+    assert list(tmp_path.glob('*.tmp')) == []
+    assert list(tmp_path.glob('*.lock')) == []
+
+
+def test_lock_files_do_not_grow_with_the_keys(tmp_path):
+    """
+    Writing and removing many keys should use a fixed pool of lock files.
+    """
+    storage = PickleStorageService(path=str(tmp_path), concurrent=True)
+    for i in range(LOCK_STRIPES * 4):
+        storage['key.{}'.format(i)] = i
+        del storage['key.{}'.format(i)]
+    assert sorted(item.name for item in tmp_path.iterdir()) == [LOCK_FOLDER]
+    assert len(list((tmp_path / LOCK_FOLDER).iterdir())) <= LOCK_STRIPES
+
+
+def test_concurrent_purges_keep_the_limit(tmp_path):
+    """
+    Several writers purging the same folder should not fail nor exceed the limit.
+    """
+    storage = DiskLRUStorageService(path=str(tmp_path), limit=10, concurrent=True)
+    errors = []
+
+    def write(thread):
+        def target():
+            for i in range(50):
+                try:
+                    storage['{}.{}'.format(thread, i)] = i
+                except Exception as ex:
+                    errors.append(ex)
+        return target
+
+    run(*[write(thread) for thread in range(4)])
+    assert errors == []
+    assert len(storage) <= 10 + 4
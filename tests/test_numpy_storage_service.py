@@ -0,0 +1,95 @@
+import pytest
+from os import rename
+from pystorage.providers import numpy_storage_service
+from pystorage.providers.numpy_storage_service import NumpyStorageService
+
+np = pytest.importorskip('numpy')
+
+
+def test_arrays_are_memory_mapped(tmp_path):
+    """
+    Stored arrays should come back as read-only memory maps with the same content.
+    """
+    storage = NumpyStorageService(path=str(tmp_path))
+    storage['matrix'] = np.arange(100).reshape(10, 10)
+    value = storage['matrix']
+    assert isinstance(value, np.memmap)
+    assert value[2:4].sum() == np.arange(20, 40).sum()
+    assert 'matrix' in storage
+    assert list(storage) == ['matrix']
+    storage['matrix'] = np.ones(3)
+    assert value[0, 0] == 0
+    assert list(storage['matrix']) == [1, 1, 1]
+    del storage['matrix']
+    with pytest.raises(KeyError):
+        storage['matrix']
+
+
+def test_object_arrays_are_loaded(tmp_path):
+    """
+    Object arrays can not be memory mapped, they should be unpickled and fully loaded.
+    """
+    storage = NumpyStorageService(path=str(tmp_path))
+    storage['objects'] = np.array([{'a': 1}, None], dtype=object)
+    assert storage['objects'][0] == {'a': 1}
+
+
+def test_frames_are_stored_by_column(tmp_path):
+    """
+    DataFrames should be stored as a folder of columns and restored with the same content.
+    """
+    pandas = pytest.importorskip('pandas')
+    storage = NumpyStorageService(path=str(tmp_path))
+    frame = pandas.DataFrame({'x': np.arange(5), 'y': np.linspace(0, 1, 5), 'name': list('abcde')})
+    frame.index.name = 'row'
+    storage['frame'] = frame
+    assert len(storage) == 1
+    loaded = storage['frame']
+    assert loaded.equals(frame)
+    assert list(loaded.columns) == ['x', 'y', 'name']
+    assert loaded.index.name == 'row'
+    storage['frame'] = np.zeros(2)
+    assert storage['frame'].shape == (2,)
+
+
+def test_frames_are_replaced_without_losing_the_old_value(tmp_path, monkeypatch):
+    """
+    Replacing a frame should rename the old folder aside, and put it back if the new one fails.
+    """
+    pandas = pytest.importorskip('pandas')
+    storage = NumpyStorageService(path=str(tmp_path))
+    storage['frame'] = pandas.DataFrame({'x': np.arange(3)})
+    storage['frame'] = pandas.DataFrame({'x': np.arange(5)})
+    assert len(storage['frame']) == 5
+    storage['frame'] = np.zeros(2)
+    storage['frame'] = pandas.DataFrame({'x': np.arange(4)})
+    assert len(storage['frame']) == 4
+    assert [item.name for item in tmp_path.iterdir()] == ['frame.storage.npy']
+
+    def failing_rename(source, destination):
+        if source.endswith('.tmp'):
+            raise OSError('disk full')
+        rename(source, destination)
+
+    monkeypatch.setattr(numpy_storage_service, 'rename', failing_rename)
+    with pytest.raises(KeyError):
+        storage['frame'] = pandas.DataFrame({'x': np.arange(7)})
+    assert len(storage['frame']) == 4
+    assert [item.name for item in tmp_path.iterdir()] == ['frame.storage.npy']
+
+
+def test_frames_with_duplicated_and_tuple_labels(tmp_path):
+    """
+    Duplicated column names and MultiIndex columns should come back as they were stored.
+    """
+    pandas = pytest.importorskip('pandas')
+    storage = NumpyStorageService(path=str(tmp_path))
+    storage['duplicated'] = pandas.DataFrame([[1, 2]], columns=['a', 'a'])
+    assert storage['duplicated'].values.tolist() == [[1, 2]]
+    assert list(storage['duplicated'].columns) == ['a', 'a']
+
+    columns = pandas.MultiIndex.from_tuples([('x', 1), ('x', 2)], names=['name', 'number'])
+    frame = pandas.DataFrame([[1.0, 2.0], [3.0, 4.0]], columns=columns)
+    storage['multi'] = frame
+    assert storage['multi'].equals(frame)
+    assert storage['multi'].columns.names == ['name', 'number']
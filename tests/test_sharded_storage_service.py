@@ -0,0 +1,63 @@
+from threading import Thread, Event
+from pystorage.providers.lru_storage_service import LRUStorageService
+from pystorage.providers.sharded_storage_service import ShardedStorageService
+
+
+def test_keys_are_spread_across_shards():
+    """
+    Every key should be stored in a single shard, and len/iteration should aggregate all of them.
+    """
+    shards = [LRUStorageService(memory_blocks=1000) for _ in range(4)]
+    storage = ShardedStorageService(shards)
+    storage.set_many({'key.{}'.format(i): i for i in range(1000)})
+    assert len(storage) == 1000
+    assert sorted(storage) == sorted('key.{}'.format(i) for i in range(1000))
+    assert all(len(shard) > 150 for shard in shards)
+    assert storage['key.10'] == 10
+    assert storage.get_many(['key.1', 'key.2', 'missing']) == {'key.1': 1, 'key.2': 2}
+    storage.delete_many(['key.1', 'missing'])
+    assert 'key.1' not in storage
+
+
+def test_adding_a_shard_moves_few_keys():
+    """
+    Adding a fifth shard should move roughly a fifth of the keys.
+    """
+    storage = ShardedStorageService({name: LRUStorageService() for name in 'abcd'})
+    keys = ['key.{}'.format(i) for i in range(10000)]
+    before = [storage.owner(key) for key in keys]
+    storage.add_shard('e', LRUStorageService())
+    moved = sum(1 for key, owner in zip(keys, before) if storage.owner(key) != owner)
+    assert 1000 < moved < 3000
+    assert all(storage.owner(key) == 'e' for key, owner in zip(keys, before) if storage.owner(key) != owner)
+
+
+def test_shards_can_change_during_batches():
+    """
+    Adding and removing shards while other threads run batches should not fail any of them.
+    """
+    storage = ShardedStorageService({name: LRUStorageService(memory_blocks=1000) for name in 'abcd'})
+    keys = ['key.{}'.format(i) for i in range(200)]
+    storage.set_many({key: key for key in keys})
+    stopped = Event()
+    errors = []
+
+    def read():
+        while not stopped.is_set():
+            try:
+                assert set(storage.get_many(keys)) <= set(keys)
+            except Exception as ex:
+                errors.append(ex)
+
+    threads = [Thread(target=read) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for i in range(50):
+        storage.add_shard('extra.{}'.format(i), LRUStorageService())
+        storage.remove_shard('extra.{}'.format(i))
+    stopped.set()
+    for thread in threads:
+        thread.join()
+    storage.close()
+    assert errors == []
+    assert storage.get_many(keys[:2]) == {key: key for key in keys[:2]}
@@ -0,0 +1,109 @@
+import random
+import pytest
+from pystorage.errors import StorageProviderError
+from pystorage.providers.lru_storage_service import LRUStorageService
+from pystorage.providers.trace_storage_service import TraceStorageService
+
+np = pytest.importorskip('numpy')
+from pystorage import simulator  # NOQA
+from pystorage.simulator import read_trace, simulate  # NOQA
+
+
+def replay(storage, keys, deletes=0):
+    """
+    Usual cache usage: read the key and store it on a miss.
+    Every `deletes` accesses the key is deleted too.
+    """
+    hits = 0
+    for position, key in enumerate(keys):
+        try:
+            storage[key]
+            hits += 1
+        except KeyError:
+            storage[key] = 'v' * 10
+        if deletes and position % deletes == 0:
+            del storage[key]
+    return hits
+
+
+def test_lru_simulation_matches_the_real_storage(tmp_path):
+    """
+    The simulated LRU hit ratio should be the one observed on a LRUStorageService of the same size.
+    """
+    random.seed(7)
+    keys = [int(random.paretovariate(1.2)) for _ in range(5000)]
+    path = str(tmp_path / 'lru.trace')
+    storage = TraceStorageService(LRUStorageService(memory_blocks=20), path=path)
+    hits = replay(storage, keys)
+    storage.close()
+
+    trace = read_trace(path)
+    assert len(trace) == 5000 + 5000 - hits
+    curve = simulate(trace, capacities=[1, 20, 1000000])
+    assert curve.hit_ratio[1] == pytest.approx(hits / 5000.0)
+    assert curve.hit_ratio[0] <= curve.hit_ratio[1] <= curve.hit_ratio[2]
+    assert curve.hit_ratio[2] == pytest.approx(1 - len(set(keys)) / 5000.0)
+    assert curve.byte_hit_ratio[1] == pytest.approx(curve.hit_ratio[1])
+
+
+@pytest.mark.parametrize('policy', ['fifo', 'lfu'])
+def test_other_policies(tmp_path, policy):
+    """
+    Bigger caches should never hit less, and an unbounded cache only misses the first accesses
+    and the accesses after a delete.
+    """
+    random.seed(7)
+    keys = [int(random.paretovariate(1.2)) for _ in range(2000)]
+    path = str(tmp_path / 'storage.trace')
+    storage = TraceStorageService(LRUStorageService(memory_blocks=1000000), path=path)
+    hits = replay(storage, keys, deletes=20)
+    storage.close()
+
+    curve = simulate(read_trace(path), capacities=[1, 5, 50, 1000000], policy=policy)
+    assert list(curve.hit_ratio) == sorted(curve.hit_ratio)
+    assert curve.hit_ratio[3] == pytest.approx(hits / 2000.0)
+
+
+@pytest.mark.parametrize('sample_rate', [0, -0.5, 1.5])
+def test_invalid_sample_rate(tmp_path, sample_rate):
+    """
+    Sample rates outside (0, 1] should be refused.
+    """
+    path = str(tmp_path / 'storage.trace')
+    storage = TraceStorageService(LRUStorageService(), path=path)
+    replay(storage, [1, 2, 1])
+    storage.close()
+    with pytest.raises(StorageProviderError):
+        simulate(read_trace(path), capacities=[10], sample_rate=sample_rate)
+
+
+def test_big_traces_are_sampled_by_default(tmp_path, monkeypatch):
+    """
+    Traces with more than EXACT_EVENTS events should be sampled down to about that many.
+    """
+    random.seed(7)
+    keys = [random.randrange(3000) for _ in range(5000)]
+    path = str(tmp_path / 'lru.trace')
+    storage = TraceStorageService(LRUStorageService(memory_blocks=100), path=path)
+    replay(storage, keys)
+    storage.close()
+    trace = read_trace(path)
+
+    monkeypatch.setattr(simulator, 'EXACT_EVENTS', len(trace) // 4)
+    sampled = simulate(trace, capacities=[100, 1000])
+    rate = (len(trace) // 4) / len(trace)
+    assert np.array_equal(sampled.hit_ratio, simulate(trace, capacities=[100, 1000], sample_rate=rate).hit_ratio)
+    exact = simulate(trace, capacities=[100, 1000], sample_rate=1)
+    assert np.allclose(sampled.hit_ratio, exact.hit_ratio, atol=0.1)
+
+
+def test_trace_close_can_be_repeated(tmp_path):
+    """
+    Closing a trace writes the buffered records once, a second close (like the one at exit) is a no-op.
+    """
+    path = str(tmp_path / 'storage.trace')
+    storage = TraceStorageService(LRUStorageService(), path=path)
+    replay(storage, [1, 2, 1])
+    storage.close()
+    storage.close()
+    assert len(read_trace(path)) == 5
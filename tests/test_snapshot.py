@@ -0,0 +1,142 @@
+import pytest
+from time import sleep
+from threading import Thread, Event
+from pystorage.providers.lru_storage_service import LRUStorageService
+from pystorage.providers.volatile_storage_service import VolatileStorageService
+
+
+def test_lru_snapshot_keeps_the_order(tmp_path):
+    """
+    A restored LRU storage should evict in the same order as the original one.
+    """
+    path = str(tmp_path / 'lru.snapshot')
+    storage = LRUStorageService(memory_blocks=3)
+    for key in 'abc':
+        storage[key] = key.upper()
+    storage['a']
+    assert storage.snapshot(path) == 3
+
+    restored = LRUStorageService(memory_blocks=3)
+    assert restored.restore(path) == 3
+    assert list(restored) == ['a', 'c', 'b']
+    restored['d'] = 'D'
+    assert 'b' not in restored
+    assert restored['a'] == 'A'
+
+
+def test_volatile_snapshot_keeps_the_expiration(tmp_path):
+    """
+    Restored values should expire at the same time as the original ones.
+    """
+    path = str(tmp_path / 'volatile.snapshot')
+    storage = VolatileStorageService(expiration=0.2)
+    storage['old'] = 1
+    sleep(0.1)
+    storage['new'] = 2
+    storage.snapshot(path)
+
+    restored = VolatileStorageService(expiration=0.2)
+    assert restored.restore(path) == 2
+    assert restored['old'] == 1
+    sleep(0.15)
+    assert 'old' not in restored
+    assert restored['new'] == 2
+    assert len(VolatileStorageService()) == 0
+
+
+def test_missing_snapshot_restores_nothing(tmp_path):
+    """
+    Restoring a snapshot that does not exist should be a no-op, so it can run on every start.
+    """
+    assert LRUStorageService().restore(str(tmp_path / 'missing')) == 0
+
+
+def test_periodic_snapshots(tmp_path):
+    """
+    The background thread should write the snapshot every interval.
+    """
+    path = tmp_path / 'lru.snapshot'
+    storage = LRUStorageService()
+    storage['a'] = 1
+    storage.start_snapshots(str(path), interval=0.05)
+    sleep(0.2)
+    storage.stop_snapshots()
+    assert path.exists()
+
+
+def test_failed_snapshot_keeps_the_previous_one(tmp_path):
+    """
+    Unpicklable values should not leave temporary files behind nor stop the periodic snapshots.
+    """
+    path = tmp_path / 'lru.snapshot'
+    storage = LRUStorageService()
+    storage['a'] = 1
+    storage.snapshot(str(path))
+    storage['lock'] = lambda: None
+    with pytest.raises(Exception):
+        storage.snapshot(str(path))
+    assert [item.name for item in tmp_path.iterdir()] == ['lru.snapshot']
+
+    storage.start_snapshots(str(path), interval=0.05)
+    sleep(0.15)
+    del storage['lock']
+    sleep(0.15)
+    assert storage.snapshots[1].is_alive()
+    storage.stop_snapshots()
+    restored = LRUStorageService()
+    assert restored.restore(str(path)) == 1
+
+
+def test_lru_snapshot_while_writing(tmp_path):
+    """
+    Snapshots taken while other threads use the cache should always be readable.
+    """
+    path = str(tmp_path / 'lru.snapshot')
+    storage = LRUStorageService(memory_blocks=100)
+    stopped = Event()
+
+    def write():
+        i = 0
+        while not stopped.is_set():
+            storage[i % 500] = i
+            try:
+                storage[i % 7]
+            except KeyError:
+                pass
+            i += 1
+
+    thread = Thread(target=write)
+    thread.start()
+    try:
+        for _ in range(20):
+            storage.snapshot(path)
+            assert LRUStorageService(memory_blocks=100).restore(path) <= 100
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def test_concurrent_snapshots_of_the_same_path(tmp_path):
+    """
+    Several threads writing snapshots of the same path should never fail.
+    """
+    path = str(tmp_path / 'lru.snapshot')
+    storage = LRUStorageService(memory_blocks=1000)
+    for i in range(1000):
+        storage[i] = i
+    errors = []
+
+    def write():
+        for _ in range(30):
+            try:
+                storage.snapshot(path)
+            except Exception as ex:
+                errors.append(ex)
+
+    threads = [Thread(target=write) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert LRUStorageService(memory_blocks=1000).restore(path) == 1000
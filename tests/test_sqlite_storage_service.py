@@ -0,0 +1,87 @@
+import pytest
+from time import sleep
+from threading import Thread
+from pystorage.errors import StorageProviderError
+from pystorage.providers.sqlite_storage_service import SQLiteStorageService
+
+
+@pytest.mark.parametrize('codec', ['pickle', 'pickle.gzip', 'json'])
+def test_values_are_stored_with_every_codec(tmp_path, codec):
+    """
+    Values should be saved, loaded, counted and removed with any codec.
+    """
+    storage = SQLiteStorageService(path=str(tmp_path / 'storage.sqlite'), codec=codec)
+    storage['hello'] = {'text': 'world'}
+    assert storage['hello'] == {'text': 'world'}
+    assert 'hello' in storage
+    assert len(storage) == 1
+    assert list(storage) == ['hello']
+    del storage['hello']
+    assert 'hello' not in storage
+    with pytest.raises(KeyError):
+        storage['hello']
+
+
+def test_batches_and_expiration(tmp_path):
+    """
+    Batched operations should work in a single call and expired values should be purged.
+    """
+    storage = SQLiteStorageService(path=str(tmp_path / 'storage.sqlite'), expiration=0.1)
+    storage.set_many({'key.{}'.format(i): i for i in range(1000)})
+    assert storage.get_many(['key.1', 'key.999', 'missing']) == {'key.1': 1, 'key.999': 999}
+    storage.delete_many(['key.1', 'missing'])
+    assert len(storage) == 999
+    sleep(0.15)
+    assert 'key.2' not in storage
+    assert len(storage) == 0
+    assert storage.purge() == 999
+
+
+def test_batches_keep_the_keys_of_the_caller(tmp_path):
+    """
+    get_many should return the keys as they were given, and iteration should read every key.
+    """
+    storage = SQLiteStorageService(path=str(tmp_path / 'storage.sqlite'))
+    storage.set_many({1: 'one', '': 'empty'})
+    assert storage.get_many([1, 'missing']) == {1: 'one'}
+    storage.set_many({'key.{}'.format(i): i for i in range(1200)})
+    assert sorted(storage) == sorted(['1', ''] + ['key.{}'.format(i) for i in range(1200)])
+
+
+def test_undecodable_values(tmp_path):
+    """
+    Corrupted values should raise KeyError on lookup and be skipped by get_many.
+    """
+    path = str(tmp_path / 'storage.sqlite')
+    SQLiteStorageService(path=path, codec='pickle')['pickled'] = 1
+    storage = SQLiteStorageService(path=path, codec='json')
+    storage['valid'] = 2
+    with pytest.raises(KeyError):
+        storage['pickled']
+    assert storage.get_many(['pickled', 'valid']) == {'valid': 2}
+
+
+def test_threads_use_their_own_connection(tmp_path):
+    """
+    Several threads should be able to write to the same storage.
+    """
+    storage = SQLiteStorageService(path=str(tmp_path / 'storage.sqlite'))
+
+    def write(thread):
+        for i in range(50):
+            storage['{}.{}'.format(thread, i)] = i
+
+    threads = [Thread(target=write, args=(t,)) for t in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(storage) == 200
+
+
+def test_invalid_codec():
+    """
+    Unknown codecs should raise StorageProviderError.
+    """
+    with pytest.raises(StorageProviderError):
+        SQLiteStorageService(codec='xml')
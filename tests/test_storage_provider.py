@@ -1,20 +1,69 @@
+import sys
 import pytest
+import subprocess
 from pystorage.errors import StorageProviderError
-from pystorage.providers.service_provider import ServiceProvider
-from pystorage.providers.services.lru_storage_service import LRUStorageService
+from pystorage.storage_provider import StorageProvider, discover
+from pystorage.providers.lru_storage_service import LRUStorageService
 
 
 def test_getting_a_lrustorage_instance_works_correctly():
     """
     Test that a LRUStorageService instance was created correctly.
     """
-    service = ServiceProvider().create(ServiceProvider.STORAGE_LRU)
+    service = StorageProvider().create(StorageProvider.STORAGE_LRU)
     assert isinstance(service, LRUStorageService)
 
 
 def test_getting_an_invalid_service():
     """
-    If I try to create an invalid service, ServiceProviderError should be raised.
+    If I try to create an invalid service, StorageProviderError should be raised.
     """
     with pytest.raises(StorageProviderError):
-        ServiceProvider().create('not.found')
+        StorageProvider().create('not.found')
+
+
+def test_storages_are_imported_lazily():
+    """
+    Importing the provider should not import any storage nor their dependencies.
+    """
+    code = (
+        'import sys; from pystorage.storage_provider import StorageProvider; '
+        'StorageProvider().create(StorageProvider.STORAGE_VOLATILE, storage={}); '
+        'print(sorted(m for m in sys.modules if m.startswith("pystorage.providers.") or m in ("pylru", "six")))'
+    )
+    output = subprocess.check_output([sys.executable, '-c', code]).decode().strip()
+    assert output == str([
+        'pystorage.providers.snapshot',
+        'pystorage.providers.storage_service',
+        'pystorage.providers.volatile_storage_service'
+    ])
+
+
+def test_register_by_import_path():
+    """
+    Storages registered by their import path should be imported when created, and bad paths refused.
+    """
+    provider = StorageProvider().register('my.lru', 'pystorage.providers.lru_storage_service:LRUStorageService')
+    assert isinstance(provider.create('my.lru', memory_blocks=5), LRUStorageService)
+    with pytest.raises(StorageProviderError):
+        provider.register('my.broken', 'pystorage.providers.missing:Storage').create('my.broken')
+
+
+def test_entry_points_are_discovered(monkeypatch):
+    """
+    Names not registered should be looked up in the entry points registry.
+    """
+    class EntryPoint(object):
+        name = 'storage.third.party'
+        value = 'pystorage.providers.lru_storage_service:LRUStorageService'
+
+    class EntryPoints(object):
+        def select(self, group):
+            return [EntryPoint()] if group == 'pystorage.providers' else []
+
+    monkeypatch.setattr('importlib.metadata.entry_points', lambda: EntryPoints())
+    discover.cache_clear()
+    try:
+        assert isinstance(StorageProvider().create('storage.third.party'), LRUStorageService)
+    finally:
+        discover.cache_clear()
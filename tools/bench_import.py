@@ -0,0 +1,51 @@
+"""
+Startup Benchmark
+=================
+Measure the time to import the StorageProvider and to create a storage in a fresh interpreter,
+so the import time does not regress.
+
+Usage:
+    python tools/bench_import.py [--runs 20] [--limit 0.05]
+
+Exits with an error if the median import time is over the limit (seconds).
+"""
+import sys
+import argparse
+import subprocess
+from statistics import median
+
+IMPORT = 'import pystorage.storage_provider'
+CREATE = (
+    'from pystorage.storage_provider import StorageProvider; '
+    'StorageProvider().create(StorageProvider.STORAGE_VOLATILE, storage={})'
+)
+MEASURE = 'import time; started = time.perf_counter(); {}; print(time.perf_counter() - started)'
+
+
+def measure(statement, runs):
+    """
+    Median seconds of running the statement in a new interpreter.
+    """
+    times = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', MEASURE.format(statement)])
+        times.append(float(output))
+    return median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--limit', type=float, default=0.05)
+    args = parser.parse_args()
+
+    imported = measure(IMPORT, args.runs)
+    created = measure(CREATE, args.runs)
+    print('import pystorage.storage_provider: {:.2f} ms'.format(imported * 1000))
+    print('import and create a volatile storage: {:.2f} ms'.format(created * 1000))
+    if imported > args.limit:
+        sys.exit('The import time is over the limit of {:.2f} ms'.format(args.limit * 1000))
+
+
+if __name__ == '__main__':
+    main()